@@ -0,0 +1,131 @@
+from collections import defaultdict
+import logging
+
+class InventoryAggregates:
+    """Running inventory totals, maintained in O(1) per item change.
+
+    Registered as an index on InventoryStore, so it sees every add/remove
+    (an update is a remove of the old item followed by an add).
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.clear()
+
+    def clear(self):
+        self.item_count = 0
+        self.total_units = 0
+        self.total_value = 0.0
+        self.category_counts = defaultdict(int)
+        self.category_units = defaultdict(int)
+        self.category_value = defaultdict(float)
+
+    def add(self, item):
+        self._apply(item, 1)
+
+    def remove(self, item):
+        self._apply(item, -1)
+
+    def _apply(self, item, sign):
+        category = item["category"]
+        value = item["quantity"] * item["price"]
+        self.item_count += sign
+        self.total_units += sign * item["quantity"]
+        self.total_value += sign * value
+        self.category_counts[category] += sign
+        self.category_units[category] += sign * item["quantity"]
+        self.category_value[category] += sign * value
+        if self.category_counts[category] == 0:
+            del self.category_counts[category]
+            del self.category_units[category]
+            del self.category_value[category]
+
+    def rebuild(self, items):
+        """Recompute all aggregates from scratch.
+
+        Column-backed item collections (see columnar.py) are summed with
+        vectorized column operations instead of row by row.
+        """
+        self.clear()
+        if hasattr(items, "column_totals"):
+            self.item_count, self.total_units, self.total_value, per_category = items.column_totals()
+            for category, (count, units, value) in per_category.items():
+                self.category_counts[category] = count
+                self.category_units[category] = units
+                self.category_value[category] = value
+            return
+        for item in items:
+            self.add(item)
+
+    def load(self, items):
+        """Populate from the full item collection when registered on a store."""
+        self.rebuild(items)
+
+    def check_consistency(self, items, rebuild=True):
+        """Compare the running totals with a full recount.
+
+        Returns True if they match. On a mismatch the aggregates are
+        rebuilt (unless `rebuild` is False) and False is returned. Values are
+        compared with a small tolerance to allow for float rounding drift.
+        """
+        expected = InventoryAggregates()
+        expected.rebuild(items)
+        consistent = (
+            self.item_count == expected.item_count
+            and self.total_units == expected.total_units
+            and abs(self.total_value - expected.total_value) <= 0.005
+            and dict(self.category_units) == dict(expected.category_units)
+            and self.category_value.keys() == expected.category_value.keys()
+            and all(
+                abs(self.category_value[category] - value) <= 0.005
+                for category, value in expected.category_value.items()
+            )
+        )
+        if not consistent:
+            if rebuild:
+                self.rebuild(items)
+                self.logger.warning("Inventory aggregates were out of sync and have been rebuilt.")
+            else:
+                self.logger.warning("Inventory aggregates are out of sync.")
+        return consistent
+
+
+class ShardedAggregates:
+    """One InventoryAggregates per shard, maintained as an index like the global one.
+
+    shard_of maps an item to its shard name (see ShardedStore.shard_of).
+    Reports map over `partials` and combine them with merge_aggregates.
+    """
+
+    def __init__(self, shard_of, shard_names):
+        self.shard_of = shard_of
+        self.partials = {name: InventoryAggregates() for name in shard_names}
+
+    def add(self, item):
+        self.partials[self.shard_of(item)].add(item)
+
+    def remove(self, item):
+        self.partials[self.shard_of(item)].remove(item)
+
+    def load(self, items):
+        for partial in self.partials.values():
+            partial.clear()
+        for item in items:
+            self.add(item)
+
+    def merged(self):
+        return merge_aggregates(self.partials.values())
+
+
+def merge_aggregates(partials):
+    """Combine partial aggregates (e.g. one per shard) into a single InventoryAggregates."""
+    merged = InventoryAggregates()
+    for partial in partials:
+        merged.item_count += partial.item_count
+        merged.total_units += partial.total_units
+        merged.total_value += partial.total_value
+        for category, count in partial.category_counts.items():
+            merged.category_counts[category] += count
+            merged.category_units[category] += partial.category_units[category]
+            merged.category_value[category] += partial.category_value[category]
+    return merged
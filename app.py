@@ -1,38 +1,95 @@
-from inventory_manager import InventoryManager
-from reports import ReportGenerator 
 from user_manager import UserManager
 from rich.prompt import Prompt
 from rich.console import Console
 from rich.table import Table
-import time
-import logging
-
-logging.basicConfig(filename='data/inventory_app.log', level=logging.INFO, 
-                       format='%(asctime)s - %(levelname)s - %(message)s')
+from log_config import configure_logging
+from metrics import REGISTRY, timed
+import config
 
 class InventoryApp:
     def __init__(self):
         self.console = Console()
-        self.inventory_manager = InventoryManager()
-        self.report_generator = ReportGenerator(self.inventory_manager)
         self.user_manager = UserManager()
         self.session_user = None
         self.session_role = None
+        # The inventory and reports are loaded on first use, not before the login prompt.
+        self._inventory_manager = None
+        self._report_generator = None
 
-        # Define menu options dynamically
+        # Define menu options dynamically; handlers resolve the managers lazily
         self.menu_options = [
-            ("View Inventory", self.inventory_manager.view_items, 'viewer'),
-            ("Add Item", self.inventory_manager.add_item, 'admin'),
-            ("Edit Item", self.inventory_manager.edit_item, 'admin'),
-            ("Delete Item", self.inventory_manager.delete_item, 'admin'),
-            ("Generate Summary Report", self.report_generator.generate_summary, 'viewer'),
-            ("Search Items", self.inventory_manager.search_items, 'viewer'),
+            ("View Inventory", lambda: self.inventory_manager.view_items(), 'viewer'),
+            ("Add Item", lambda: self.inventory_manager.add_item(), 'admin'),
+            ("Edit Item", lambda: self.inventory_manager.edit_item(), 'admin'),
+            ("Delete Item", lambda: self.inventory_manager.delete_item(), 'admin'),
+            ("Generate Summary Report", lambda: self.report_generator.generate_summary(), 'viewer'),
+            ("Search Items", lambda: self.inventory_manager.search_items(), 'viewer'),
             ("Low-Stock Alerts", self._handle_low_stock_alerts, 'viewer'),
-            ("Category-Wise Stock Distribution", self.report_generator.generate_category_distribution, 'viewer'),
-            ("Inventory Value Trends", self.report_generator.generate_inventory_value_trend, 'viewer'),
+            ("Reorder-Point Alerts", lambda: self.report_generator.generate_reorder_alert(), 'viewer'),
+            ("Category-Wise Stock Distribution", lambda: self.report_generator.generate_category_distribution(), 'viewer'),
+            ("Inventory Value Trends", self._handle_value_trend, 'viewer'),
+            ("Performance Stats", self.show_performance_stats, 'admin'),
             ("Exit", self.exit_app, "viewer"),
         ]
-    
+        if config.REPLICA_SOURCE:
+            # A replica only serves reads; changes are made on the primary
+            self.menu_options = [
+                option for option in self.menu_options if option[0] not in ("Add Item", "Edit Item", "Delete Item")
+            ]
+
+    @property
+    def inventory_manager(self):
+        """Load the inventory (and its heavy imports) on first use."""
+        if self._inventory_manager is None:
+            from inventory_manager import InventoryManager
+            self._inventory_manager = InventoryManager()
+        return self._inventory_manager
+
+    @property
+    def report_generator(self):
+        if self._report_generator is None:
+            from reports import ReportGenerator
+            self._report_generator = ReportGenerator(self.inventory_manager)
+        return self._report_generator
+
+    def show_performance_stats(self):
+        """Show latency percentiles per operation and I/O counters, optionally exporting them."""
+        histograms, counters = REGISTRY.snapshot()
+        if not histograms and not counters:
+            self.console.print("[bold yellow]No operations recorded yet.[/bold yellow]")
+            return
+
+        table = Table(title="Operation Latency", header_style="bold magenta")
+        table.add_column("Operation", style="cyan")
+        for column in ("Count", "Mean", "p50", "p95", "p99", "Max"):
+            table.add_column(column, justify="right")
+        for name, histogram in sorted(histograms.items()):
+            table.add_row(
+                name, str(histogram.count),
+                *(f"{seconds * 1000:.2f} ms" for seconds in (
+                    histogram.sum / histogram.count, histogram.percentile(0.5),
+                    histogram.percentile(0.95), histogram.percentile(0.99), histogram.max,
+                )),
+            )
+        self.console.print(table)
+
+        if counters:
+            counter_table = Table(title="Counters", header_style="bold magenta")
+            counter_table.add_column("Counter", style="cyan")
+            counter_table.add_column("Value", justify="right")
+            for name, value in sorted(counters.items()):
+                counter_table.add_row(name, f"{value:,}")
+            self.console.print(counter_table)
+
+        path = Prompt.ask("Export in Prometheus text format to (leave empty to skip)", default="")
+        if path:
+            try:
+                with open(path, "w") as file:
+                    file.write(REGISTRY.to_prometheus())
+                self.console.print(f"[bold green]Metrics written to {path}.[/bold green]")
+            except OSError as e:
+                self.console.print(f"[bold red]Could not write metrics: {e}[/bold red]")
+
     def authenticate(self):
         """Handle user login or signup."""
         while not self.session_user:
@@ -51,6 +108,11 @@ class InventoryApp:
             self.console.print("[bold red]Threshold must be an integer.[/bold red]")
 
 
+    def _handle_value_trend(self):
+        windows = list(self.report_generator.TREND_WINDOWS)
+        window = Prompt.ask("Trend window", choices=windows, default="30d")
+        self.report_generator.generate_inventory_value_trend(window)
+
     def display_menu(self):
         """Display the menu based on the user's role."""
         self.console.print("\n[bold cyan]--- Inventory Management Menu ---[/bold cyan]")
@@ -71,24 +133,31 @@ class InventoryApp:
         self.clear_screen()
         self.authenticate()  # Ensure the user is authenticated
         self.console.print(f"\n[bold green]Welcome, {self.session_user}![/bold green]")
-        time.sleep(3)
         while True:
-            self.clear_screen()
             self.display_menu()
             choice = Prompt.ask("Choose an option", choices=[str(i) for i in range(1, len(self.menu_options) + 1)], show_choices=False)
             idx = int(choice) - 1
             description, handler, role = self.menu_options[idx]
             if self.is_action_allowed(role):
-                handler()
+                if self._inventory_manager is not None:
+                    # Pick up what other operators changed since the last action
+                    self._inventory_manager.refresh()
+                with timed(f"menu.{description}"):
+                    handler()
             else:
                 self.console.print("[bold red]Access denied![/bold red]")
             Prompt.ask("\nPress [bold]Enter[/bold] to continue...")
+            self.clear_screen()
 
     def exit_app(self):
         self.console.print("[bold green]Exiting the application... Goodbye![/bold green]")
+        if self._inventory_manager is not None:
+            self._inventory_manager.datastore.close()
+        self.user_manager.close()
         exit()
 
 
 if __name__ == "__main__":
+    configure_logging()
     app = InventoryApp()
     app.start()
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""Benchmarks for the inventory hot paths on synthetic data.
+
+Usage:
+    python benchmark.py [--sizes 10000 100000 1000000] [--seed 42] [--repeat 5]
+                        [--output benchmark_results.json]
+                        [--baseline benchmark_baseline.json] [--save-baseline]
+                        [--tolerance 0.25] [--compact] [--snapshot-format binary]
+
+For each catalog size a seeded synthetic inventory (see synthetic.py) is
+written to a temporary directory, and the following are timed without any
+interactive prompts: DataStore save/load, InventoryManager startup,
+add/edit/delete by ID, each search mode, every ReportGenerator report and
+UserManager load/save, sign-up and a burst of concurrent logins.
+Per-operation benchmarks report the time of one operation.
+
+Results are written as JSON. If a baseline file exists, every benchmark is
+compared with it and those slower than the tolerance allows, by more than
+the run-to-run spread of either run, are flagged; the exit status is 1
+when there is a regression. --save-baseline makes the
+current run the new baseline.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from rich.console import Console
+from rich.table import Table
+from datastore import DataStore
+from inventory_manager import InventoryManager
+from passwords import hash_password
+from reports import ReportGenerator
+from synthetic import NOUNS, BRANDS, CATEGORIES, generate_items, generate_users
+from user_manager import UserManager
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+OPERATIONS = 200
+# Logins are deliberately slow (see passwords.py), so fewer are timed
+LOGINS = 16
+SEARCH_QUERIES = 20
+# Differences below this many seconds are treated as timer noise
+MIN_REGRESSION_DELTA = 1e-5
+# Fewer repetitions leave too much noise for a meaningful comparison
+MIN_COMPARABLE_REPEAT = 5
+
+
+def measure(func, repeat, setup=None, operations=1):
+    """Run func `repeat` times and return its timings in seconds per operation.
+
+    setup, if given, runs untimed before every repetition and its return
+    value is passed to func.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) / operations)
+    return {"min": min(timings), "median": statistics.median(timings), "operations": operations}
+
+
+class InventoryBenchmark:
+    """Times the hot paths for one catalog size inside a scratch directory."""
+
+    def __init__(self, size, directory, seed=42, repeat=3, compact=False, snapshot_format="json"):
+        self.size = size
+        self.directory = directory
+        self.seed = seed
+        self.repeat = repeat
+        self.compact = compact
+        self.snapshot_format = snapshot_format
+        self.rng = random.Random(seed)
+        self.console = Console(file=open(os.devnull, "w"))
+        self.results = {}
+
+    def run(self):
+        self.benchmark_datastore()
+        self.benchmark_manager()
+        self.benchmark_users()
+        self.console.file.close()
+        return self.results
+
+    def _datastore(self, name):
+        return DataStore(os.path.join(self.directory, f"{name}.json"), snapshot_format=self.snapshot_format)
+
+    def benchmark_datastore(self):
+        items = list(generate_items(self.size, self.seed))
+        datastore = self._datastore("inventory")
+        self.results["datastore.save_data"] = measure(lambda: datastore.save_data(items), self.repeat)
+        del items
+        self.results["datastore.load_data"] = measure(datastore.load_data, self.repeat)
+
+    def benchmark_manager(self):
+        managers = []
+
+        def discard_previous():
+            while managers:
+                managers.pop().datastore.close()
+
+        self.results["manager.startup"] = measure(
+            lambda _: managers.append(InventoryManager(self._datastore("inventory"), compact=self.compact)),
+            self.repeat, setup=discard_previous,
+        )
+        manager = managers.pop()
+        manager.console = self.console
+
+        new_items = list(generate_items(OPERATIONS, self.seed + 1))
+        for item in new_items:
+            del item["id"]
+        # Adds and deletes are timed one by one, so each is a repetition of its own
+        pending_items = iter(new_items)
+        added_ids = []
+        self.results["manager.add_item"] = measure(
+            lambda: added_ids.append(manager.add_items([next(pending_items)])[0]["id"]), OPERATIONS,
+        )
+        edit_ids = self.rng.sample(range(1, self.size + 1), OPERATIONS)
+        self.results["manager.edit_item"] = measure(
+            lambda: [manager.update_item(item_id, quantity=self.rng.randint(0, 500),
+                                         price=round(self.rng.uniform(1, 500), 2))
+                     for item_id in edit_ids],
+            self.repeat, operations=OPERATIONS,
+        )
+        deleted_ids = iter(added_ids)
+        self.results["manager.delete_item"] = measure(lambda: manager.remove_item(next(deleted_ids)), OPERATIONS)
+
+        name_queries = [self.rng.choice(NOUNS + BRANDS)[:self.rng.randint(3, 6)] for _ in range(SEARCH_QUERIES)]
+        category_queries = [self.rng.choice(CATEGORIES)[:self.rng.randint(3, 8)] for _ in range(SEARCH_QUERIES)]
+        price_ranges = [sorted((self.rng.uniform(1, 300), self.rng.uniform(1, 300))) for _ in range(SEARCH_QUERIES)]
+        limit = manager.SEARCH_RESULT_LIMIT
+        self.results["search.name"] = measure(
+            lambda: [manager.find_items(name=query, limit=limit) for query in name_queries],
+            self.repeat, operations=SEARCH_QUERIES,
+        )
+        self.results["search.category"] = measure(
+            lambda: [manager.find_items(category=query, limit=limit) for query in category_queries],
+            self.repeat, operations=SEARCH_QUERIES,
+        )
+        self.results["search.price_range"] = measure(
+            lambda: [manager.find_items(min_price=low, max_price=high, limit=limit) for low, high in price_ranges],
+            self.repeat, operations=SEARCH_QUERIES,
+        )
+
+        reports = ReportGenerator(manager)
+        reports.console = self.console
+        self.results["report.summary"] = measure(reports.generate_summary, self.repeat)
+        self.results["report.low_stock"] = measure(lambda: reports.generate_low_stock_alert(10), self.repeat)
+        self.results["report.reorder"] = measure(
+            lambda _: reports.generate_reorder_alert(), self.repeat, setup=lambda: self._cross_reorder_points(manager),
+        )
+        self.results["report.category_distribution"] = measure(reports.generate_category_distribution, self.repeat)
+        self.results["report.value_trend"] = measure(reports.generate_inventory_value_trend, self.repeat)
+        manager.datastore.close()
+
+    def _cross_reorder_points(self, manager):
+        """Drop a few items with reorder points to zero stock so the reorder report has work to do."""
+        for item_id in self.rng.sample(range(1, self.size + 1), min(OPERATIONS, self.size)):
+            item = manager.store.get(item_id)
+            if item is not None and item.get("reorder_point") is not None and item.get("reserved", 0) == 0:
+                manager.update_item(item_id, quantity=0)
+
+    def benchmark_users(self):
+        datastore = DataStore(os.path.join(self.directory, "users.json"), key="username")
+        users = generate_users(min(self.size // 10, 10_000), hash_password, self.seed)
+        datastore.save_data(users)
+        user_manager = UserManager(datastore)
+        user_manager.console = self.console
+        self.results["users.save"] = measure(user_manager.save_users, self.repeat)
+        self.results["users.load"] = measure(user_manager.load_users, self.repeat)
+        new_users = iter(range(self.repeat))
+        self.results["users.sign_up"] = measure(
+            lambda: user_manager.create_user(f"new{next(new_users)}", "password", "viewer"), self.repeat,
+        )
+        usernames = self.rng.sample(sorted(users), min(LOGINS, len(users)))
+        with ThreadPoolExecutor(max_workers=len(usernames)) as logins:
+            # All logins arrive at once and queue on the hashing pool
+            self.results["users.authenticate"] = measure(
+                lambda: list(logins.map(lambda username: user_manager.authenticate(username, "password"), usernames)),
+                self.repeat, operations=len(usernames),
+            )
+        user_manager.close()
+
+
+def compare(results, baseline, tolerance):
+    """Return [(size, name, baseline seconds, current seconds, ratio, regressed)].
+
+    Fastest runs are compared, since they are the least affected by noise.
+    A slowdown only counts as a regression when it exceeds the tolerance and
+    also the spread (median - min) measured in either run.
+    """
+    rows = []
+    for size, benchmarks in results.items():
+        for name, timing in benchmarks.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            before, after = previous["min"], timing["min"]
+            ratio = after / before if before else float("inf")
+            noise = max(MIN_REGRESSION_DELTA, previous["median"] - before, timing["median"] - after)
+            regressed = ratio > 1 + tolerance and after - before > noise
+            rows.append((size, name, before, after, ratio, regressed))
+    return rows
+
+
+def print_comparison(console, rows, tolerance):
+    table = Table(title=f"Benchmark vs. baseline (tolerance {tolerance:.0%})", header_style="bold magenta")
+    for column in ("Size", "Benchmark", "Baseline", "Current", "Change"):
+        table.add_column(column, justify="left" if column == "Benchmark" else "right")
+    for size, name, before, after, ratio, regressed in rows:
+        style = "bold red" if regressed else "green" if ratio < 1 else ""
+        table.add_row(size, name, f"{before * 1000:.3f} ms", f"{after * 1000:.3f} ms",
+                      f"[{style}]{ratio - 1:+.1%}[/{style}]" if style else f"{ratio - 1:+.1%}")
+    console.print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inventory operations on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=MIN_COMPARABLE_REPEAT,
+                        help=f"Runs per benchmark; the fastest is compared (at least {MIN_COMPARABLE_REPEAT} to compare).")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown before a benchmark is flagged (0.25 = 25%%).")
+    parser.add_argument("--compact", action="store_true", help="Use the compact columnar item store.")
+    parser.add_argument("--snapshot-format", choices=["json", "binary"], default="json")
+    args = parser.parse_args(argv)
+
+    console = Console()
+    results = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory(prefix="inventory-benchmark-") as directory:
+            with console.status(f"Benchmarking {size:,} items..."):
+                results[str(size)] = InventoryBenchmark(
+                    size, directory, args.seed, args.repeat, args.compact, args.snapshot_format,
+                ).run()
+        console.print(f"[bold green]Finished {size:,} items.[/bold green]")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "compact": args.compact,
+        "snapshot_format": args.snapshot_format,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    console.print(f"Results written to [bold]{args.output}[/bold].")
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        changed = [setting for setting in ("seed", "compact", "snapshot_format") if baseline.get(setting) != report[setting]]
+        if changed:
+            console.print(f"[yellow]The baseline was run with different settings ({', '.join(changed)}); "
+                          f"timings may not be comparable.[/yellow]")
+        rows = compare(results, baseline["results"], args.tolerance)
+        print_comparison(console, rows, args.tolerance)
+        if min(args.repeat, baseline.get("repeat", 0)) < MIN_COMPARABLE_REPEAT:
+            # A handful of runs cannot tell a slowdown from noise
+            console.print(f"[yellow]Regressions are not checked with fewer than {MIN_COMPARABLE_REPEAT} repeats "
+                          f"per run.[/yellow]")
+        else:
+            regressions = [row for row in rows if row[5]]
+        if regressions:
+            console.print(f"[bold red]{len(regressions)} benchmark(s) regressed beyond the tolerance.[/bold red]")
+    elif not args.save_baseline:
+        console.print(f"[yellow]No baseline at {args.baseline}; run with --save-baseline to create one.[/yellow]")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        console.print(f"Baseline saved to [bold]{args.baseline}[/bold].")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
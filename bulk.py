@@ -0,0 +1,179 @@
+"""Non-interactive bulk import/export of inventory items.
+
+Usage:
+    python bulk.py import items.csv [--batch-size 5000] [--rejects rejects.csv]
+    python bulk.py export items.jsonl
+
+The format (CSV or JSONL) follows the file extension unless --format is
+given. Rows are streamed: imports validate each row with the same rules as
+the interactive prompts and commit in batches, exports write items as they
+are read from the storage backend.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import logging
+from rich.console import Console
+from inventory_manager import InventoryManager
+from storage import create_datastore
+from log_config import configure_logging
+
+FIELDS = ["id", "name", "category", "quantity", "price", "reorder_point", "warehouse"]
+
+
+def detect_format(path, file_format=None):
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; use --format csv or --format jsonl.")
+
+
+def read_rows(path, file_format):
+    """Yield (line number, row dict) pairs from a CSV or JSONL file."""
+    with open(path, "r", newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {"__error__": f"Invalid JSON: {e}"}
+                yield line_number, row
+
+
+class BulkImporter:
+    """Validate rows and add them to the inventory in batches."""
+
+    MAX_REPORTED_REJECTS = 10
+
+    def __init__(self, inventory_manager, batch_size=5000, console=None):
+        self.inventory_manager = inventory_manager
+        self.batch_size = batch_size
+        self.console = console or Console()
+        self.logger = logging.getLogger(__name__)
+        self.imported = 0
+        self.rejected = 0
+
+    def validate_row(self, row):
+        """Return a validated item dict (without ID) or raise ValueError."""
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object.")
+        if "__error__" in row:
+            raise ValueError(row["__error__"])
+        missing = [field for field in ("name", "category", "quantity", "price") if row.get(field) in (None, "")]
+        if missing:
+            raise ValueError(f"Missing field(s): {', '.join(missing)}")
+        return self.inventory_manager.validate_item_fields(
+            str(row["name"]), str(row["category"]), row["quantity"], row["price"], row.get("reorder_point"),
+            row.get("warehouse"),
+        )
+
+    def run(self, rows, reject_writer=None):
+        """Import (line number, row) pairs; rejected rows go to reject_writer if given."""
+        batch = []
+        for line_number, values in rows:
+            try:
+                batch.append(self.validate_row(values))
+            except ValueError as e:
+                self._reject(line_number, values, e, reject_writer)
+                continue
+            if len(batch) >= self.batch_size:
+                self._commit(batch)
+                batch = []
+        if batch:
+            self._commit(batch)
+        self.logger.info("Bulk import finished: %s imported, %s rejected.", self.imported, self.rejected)
+        return self.imported, self.rejected
+
+    def _reject(self, line_number, values, error, reject_writer):
+        self.rejected += 1
+        if self.rejected <= self.MAX_REPORTED_REJECTS:
+            self.console.print(f"[bold red]Line {line_number}: {error}[/bold red]")
+        elif self.rejected == self.MAX_REPORTED_REJECTS + 1:
+            self.console.print("[bold red]Further rejected rows are not shown.[/bold red]")
+        if reject_writer:
+            reject_writer.writerow({"line": line_number, "error": str(error), "row": json.dumps(values)})
+
+    def _commit(self, batch):
+        self.inventory_manager.add_items(batch)
+        self.imported += len(batch)
+        self.console.print(f"Imported {self.imported} rows ({self.rejected} rejected)...")
+
+
+def export_items(datastore, path, file_format):
+    """Stream every item from the storage backend to a CSV or JSONL file."""
+    count = 0
+    with open(path, "w", newline="") as file:
+        if file_format == "csv":
+            writer = csv.DictWriter(file, fieldnames=FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for item in datastore.iter_items():
+                writer.writerow(item)
+                count += 1
+        else:
+            for item in datastore.iter_items():
+                file.write(json.dumps(item) + "\n")
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export inventory items.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Import items from a CSV or JSONL file.")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "jsonl"])
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.add_argument("--rejects", help="Write rejected rows and their errors to this CSV file.")
+    export_parser = subparsers.add_parser("export", help="Export items to a CSV or JSONL file.")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"])
+    args = parser.parse_args(argv)
+
+    console = Console()
+    try:
+        file_format = detect_format(args.path, args.format)
+    except ValueError as e:
+        console.print(f"[bold red]{e}[/bold red]")
+        return 2
+
+    if args.command == "export":
+        datastore = create_datastore("inventory")
+        try:
+            count = export_items(datastore, args.path, file_format)
+        finally:
+            datastore.close()
+        console.print(f"[bold green]Exported {count} items to {args.path}.[/bold green]")
+        return 0
+
+    inventory_manager = InventoryManager()
+    importer = BulkImporter(inventory_manager, batch_size=args.batch_size, console=console)
+    reject_file = open(args.rejects, "w", newline="") if args.rejects else None
+    try:
+        reject_writer = None
+        if reject_file:
+            reject_writer = csv.DictWriter(reject_file, fieldnames=["line", "error", "row"])
+            reject_writer.writeheader()
+        imported, rejected = importer.run(read_rows(args.path, file_format), reject_writer)
+    finally:
+        if reject_file:
+            reject_file.close()
+        inventory_manager.datastore.close()
+    console.print(f"[bold green]Imported {imported} items.[/bold green] Rejected {rejected} rows.")
+    return 0
+
+
+if __name__ == "__main__":
+    configure_logging()
+    sys.exit(main())
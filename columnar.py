@@ -0,0 +1,324 @@
+from array import array
+from collections.abc import Mapping, MutableMapping
+from operator import mul, sub
+import sys
+
+try:
+    import numpy
+except ImportError:  # numpy is optional; the array module covers the same ground more slowly
+    numpy = None
+
+CORE_FIELDS = ("id", "name", "category", "quantity", "price")
+# Optional whole-number fields most items carry; kept in int64 columns, -1 when absent
+COUNTER_FIELDS = ("version", "reserved")
+
+
+def _copy_column(typecode, values):
+    """Copy a typed buffer (memoryview or array) into a new array in one go."""
+    column = array(typecode)
+    column.frombytes(memoryview(values).cast("B"))
+    return column
+
+
+class ItemView(MutableMapping):
+    """Dict-like view of one row of a ColumnarItems table.
+
+    Reads and writes go straight to the columns, so code written against
+    item dicts keeps working. Use `dict(view)` for a detached copy.
+    """
+
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, table, slot):
+        self._table = table
+        self._slot = slot
+
+    def __getitem__(self, field):
+        return self._table._get(self._slot, field)
+
+    def __setitem__(self, field, value):
+        self._table._set(self._slot, field, value)
+
+    def __delitem__(self, field):
+        self._table._delete(self._slot, field)
+
+    def __iter__(self):
+        yield from CORE_FIELDS
+        yield from self._table._counter_fields(self._slot)
+        yield from self._table._extras.get(self._slot, ())
+
+    def __len__(self):
+        table = self._table
+        return len(CORE_FIELDS) + len(table._counter_fields(self._slot)) + len(table._extras.get(self._slot, ()))
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return dict(self) == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ColumnarValues:
+    """Live, sized, iterable view of all rows, like dict.values()."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __len__(self):
+        return len(self._table)
+
+    def __iter__(self):
+        table = self._table
+        return (ItemView(table, slot) for slot in table._slots.values())
+
+    def column_totals(self):
+        return self._table.column_totals()
+
+
+class ColumnarItems:
+    """Compact id -> item mapping backed by typed columns.
+
+    IDs and quantities are stored as 64-bit integers and prices as doubles
+    in `array` columns; categories are dictionary-encoded to small integer
+    codes and names are packed into one UTF-8 buffer indexed by offset. The
+    "version" and "reserved" counters get int64 columns too. Other fields
+    are kept in a per-row dict only for rows that have them. Deleted rows are reused
+    through a free list. The interface mirrors the parts of `dict` that
+    InventoryStore uses; values are ItemView rows created on access.
+    """
+
+    def __init__(self):
+        self._ids = array("q")
+        self._quantities = array("q")
+        self._prices = array("d")
+        self._category_codes = array("i")
+        self._name_blob = bytearray()
+        self._name_offsets = array("q")
+        self._name_lengths = array("i")
+        self._name_garbage = 0
+        self._counters = {field: array("q") for field in COUNTER_FIELDS}
+        self._categories = []
+        self._category_lookup = {}
+        self._extras = {}
+        self._slots = {}
+        self._free_slots = []
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Build a table from a snapshot.BinarySnapshot by copying its columns wholesale.
+
+        The snapshot uses the same column layout, so no row is decoded.
+        """
+        table = cls()
+        table._ids = _copy_column("q", snapshot.ids)
+        table._quantities = _copy_column("q", snapshot.quantities)
+        table._prices = _copy_column("d", snapshot.prices)
+        table._category_codes = _copy_column("i", snapshot.categories)
+        table._categories = [sys.intern(category) for category in snapshot.category_names]
+        table._category_lookup = {category: code for code, category in enumerate(table._categories)}
+        table._name_blob = bytearray(snapshot.names)
+        ends = _copy_column("q", snapshot.name_ends)
+        if ends:
+            table._name_offsets = array("q", [0])
+            table._name_offsets.extend(ends[:-1])
+            table._name_lengths = array("i", map(sub, ends, table._name_offsets))
+        for field in COUNTER_FIELDS:
+            values = snapshot.counters.get(field)
+            table._counters[field] = _copy_column("q", values) if values is not None else array("q", [-1]) * len(table._ids)
+        for row, extra in snapshot.extras.items():
+            for field, value in extra.items():
+                table._set(row, field, value)
+        table._slots = dict(zip(table._ids, range(len(table._ids))))
+        return table
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, item_id):
+        return item_id in self._slots
+
+    def __getitem__(self, item_id):
+        return ItemView(self, self._slots[item_id])
+
+    def get(self, item_id, default=None):
+        slot = self._slots.get(item_id)
+        return default if slot is None else ItemView(self, slot)
+
+    def keys(self):
+        return self._slots.keys()
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def values(self):
+        return ColumnarValues(self)
+
+    def _category_code(self, category):
+        code = self._category_lookup.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(sys.intern(category))
+            self._category_lookup[category] = code
+        return code
+
+    def __setitem__(self, item_id, item):
+        if item_id in self._slots:
+            self[item_id].update(item)
+            return
+        row = (
+            item_id,
+            int(item["quantity"]),
+            float(item["price"]),
+            self._category_code(item["category"]),
+        )
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._ids[slot], self._quantities[slot], self._prices[slot], self._category_codes[slot] = row
+        else:
+            slot = len(self._ids)
+            self._ids.append(row[0])
+            self._quantities.append(row[1])
+            self._prices.append(row[2])
+            self._category_codes.append(row[3])
+            self._name_offsets.append(0)
+            self._name_lengths.append(0)
+            for column in self._counters.values():
+                column.append(-1)
+        self._slots[item_id] = slot
+        self._store_name(slot, item["name"])
+        for field, value in item.items():
+            if field not in CORE_FIELDS:
+                self._set(slot, field, value)
+
+    def pop(self, item_id):
+        """Remove a row and return a detached dict copy of it."""
+        slot = self._slots.pop(item_id)
+        item = dict(ItemView(self, slot))
+        self._extras.pop(slot, None)
+        for column in self._counters.values():
+            column[slot] = -1
+        self._name_garbage += self._name_lengths[slot]
+        self._name_lengths[slot] = 0
+        self._quantities[slot] = 0
+        self._prices[slot] = 0.0
+        self._category_codes[slot] = -1
+        self._free_slots.append(slot)
+        return item
+
+    def _get(self, slot, field):
+        if field == "id":
+            return self._ids[slot]
+        if field == "name":
+            offset = self._name_offsets[slot]
+            return self._name_blob[offset:offset + self._name_lengths[slot]].decode()
+        if field == "category":
+            return self._categories[self._category_codes[slot]]
+        if field == "quantity":
+            return self._quantities[slot]
+        if field == "price":
+            return self._prices[slot]
+        if field in self._counters and self._counters[field][slot] >= 0:
+            return self._counters[field][slot]
+        return self._extras.get(slot, {})[field]
+
+    def _counter_fields(self, slot):
+        return [field for field, column in self._counters.items() if column[slot] >= 0]
+
+    def _set(self, slot, field, value):
+        if field == "id":
+            if value != self._ids[slot]:
+                raise ValueError("Item IDs cannot be changed.")
+        elif field == "name":
+            self._name_garbage += self._name_lengths[slot]
+            self._store_name(slot, value)
+        elif field == "category":
+            self._category_codes[slot] = self._category_code(value)
+        elif field == "quantity":
+            self._quantities[slot] = int(value)
+        elif field == "price":
+            self._prices[slot] = float(value)
+        elif field in self._counters and type(value) is int and 0 <= value < 1 << 63:
+            self._counters[field][slot] = value
+            self._delete_extra(slot, field)
+        else:
+            if field in self._counters:
+                self._counters[field][slot] = -1
+            self._extras.setdefault(slot, {})[field] = value
+
+    def _store_name(self, slot, name):
+        """Append a name to the shared UTF-8 blob, repacking it once half of it is garbage."""
+        data = name.encode()
+        self._name_offsets[slot] = len(self._name_blob)
+        self._name_lengths[slot] = len(data)
+        self._name_blob += data
+        if self._name_garbage > len(self._name_blob) // 2:
+            self._repack_names()
+
+    def _repack_names(self):
+        blob = bytearray()
+        for slot in self._slots.values():
+            offset = self._name_offsets[slot]
+            length = self._name_lengths[slot]
+            self._name_offsets[slot] = len(blob)
+            blob += self._name_blob[offset:offset + length]
+        self._name_blob = blob
+        self._name_garbage = 0
+
+    def _delete(self, slot, field):
+        if field in CORE_FIELDS:
+            raise KeyError(f"Cannot delete core field {field}.")
+        if field in self._counters and self._counters[field][slot] >= 0:
+            self._counters[field][slot] = -1
+            return
+        if field not in self._extras.get(slot, {}):
+            raise KeyError(field)
+        self._delete_extra(slot, field)
+
+    def _delete_extra(self, slot, field):
+        extras = self._extras.get(slot)
+        if extras is not None and field in extras:
+            del extras[field]
+            if not extras:
+                del self._extras[slot]
+
+    def column_totals(self):
+        """Return (item count, total units, total value, {category: (count, units, value)}).
+
+        Computed with vectorized column operations; freed slots hold zero
+        quantity/price and category code -1, so they drop out of every sum.
+        """
+        live_codes = range(len(self._categories))
+        if numpy is not None and len(self._ids):
+            quantities = numpy.frombuffer(self._quantities, dtype=numpy.int64)
+            prices = numpy.frombuffer(self._prices, dtype=numpy.float64)
+            codes = numpy.frombuffer(self._category_codes, dtype=numpy.int32)
+            values = quantities * prices
+            live = codes >= 0
+            size = len(self._categories)
+            counts = numpy.bincount(codes[live], minlength=size)
+            units = numpy.bincount(codes[live], weights=quantities[live], minlength=size)
+            value_sums = numpy.bincount(codes[live], weights=values[live], minlength=size)
+            total_units = int(quantities.sum())
+            total_value = float(values.sum())
+            per_category = {
+                self._categories[code]: (int(counts[code]), int(units[code]), float(value_sums[code]))
+                for code in live_codes if counts[code]
+            }
+        else:
+            total_units = sum(self._quantities)
+            total_value = sum(map(mul, self._quantities, self._prices))
+            counts = [0] * len(self._categories)
+            units = [0] * len(self._categories)
+            value_sums = [0.0] * len(self._categories)
+            for code, quantity, price in zip(self._category_codes, self._quantities, self._prices):
+                if code >= 0:
+                    counts[code] += 1
+                    units[code] += quantity
+                    value_sums[code] += quantity * price
+            per_category = {
+                self._categories[code]: (counts[code], units[code], value_sums[code])
+                for code in live_codes if counts[code]
+            }
+        return len(self._slots), total_units, total_value, per_category
@@ -0,0 +1,43 @@
+import os
+
+# Storage backend for inventory and user data: "json" or "sqlite".
+STORAGE_BACKEND = os.environ.get("INVENTORY_STORAGE_BACKEND", "json").lower()
+
+# Directory holding the data files of either backend.
+DATA_DIR = os.environ.get("INVENTORY_DATA_DIR", "data")
+
+# File name of the SQLite database inside DATA_DIR.
+SQLITE_DATABASE = os.environ.get("INVENTORY_SQLITE_DATABASE", "inventory.db")
+
+# Keep inventory items in compact typed columns instead of one dict per item.
+COMPACT_MEMORY = os.environ.get("INVENTORY_COMPACT_MEMORY", "").lower() in ("1", "true", "yes")
+
+# Snapshot format of the JSON backend's inventory: "json" or "binary"
+# (memory-mappable, see snapshot.py).
+SNAPSHOT_FORMAT = os.environ.get("INVENTORY_SNAPSHOT_FORMAT", "json").lower()
+
+# Minimum seconds between two samples of the inventory value history (see
+# timeseries.py); 0 records a sample on every change.
+HISTORY_INTERVAL = float(os.environ.get("INVENTORY_HISTORY_INTERVAL", "60"))
+
+# Split the inventory into shards: "" (off), "warehouse" or "category" (see
+# sharded_store.py), with the shard names listed in INVENTORY_SHARDS.
+SHARD_BY = os.environ.get("INVENTORY_SHARD_BY", "").lower()
+SHARDS = [name.strip() for name in os.environ.get("INVENTORY_SHARDS", "main").split(",") if name.strip()]
+
+# Replication (see replication.py). A primary publishes inventory deltas to
+# INVENTORY_REPLICATION_DIR; a read-only replica follows INVENTORY_REPLICA_SOURCE,
+# that directory or the host:port of `python replication.py serve`.
+REPLICATION_DIR = os.environ.get("INVENTORY_REPLICATION_DIR", "")
+REPLICA_SOURCE = os.environ.get("INVENTORY_REPLICA_SOURCE", "")
+
+# Password hashing (see passwords.py): "scrypt" or "pbkdf2", and the cost of
+# each (empty for the default). Stored hashes made with other settings are
+# upgraded on the next login.
+PASSWORD_HASH = os.environ.get("INVENTORY_PASSWORD_HASH", "scrypt").lower()
+# log2 of scrypt's N
+SCRYPT_COST = int(os.environ.get("INVENTORY_SCRYPT_COST") or 0)
+PBKDF2_ITERATIONS = int(os.environ.get("INVENTORY_PBKDF2_ITERATIONS") or 0)
+
+# Threads hashing passwords in parallel; 0 picks up to 4 based on the CPU count.
+HASH_WORKERS = int(os.environ.get("INVENTORY_HASH_WORKERS") or 0)
@@ -1,32 +1,504 @@
 import json
 import os
 import logging
+import threading
+import uuid
+from filelock import FileLock
+from storage import StorageBackend
+from snapshot import BinarySnapshot, write_snapshot
+from columnar import ColumnarItems
+from metrics import count, timed
 
-class DataStore:
-    def __init__(self, file_path="data/inventory.json"):
+class DataStore(StorageBackend):
+    """JSON snapshot plus an append-only change log.
+
+    Single-item mutations are appended to a JSONL change log next to the
+    snapshot, so their cost depends on the size of the change rather than
+    the size of the inventory. `load_data` replays the log over the last
+    snapshot, and once the log grows past `compact_threshold` records it is
+    folded into a new snapshot in the background.
+
+    With `snapshot_format="binary"` snapshots are written in the
+    memory-mappable format of snapshot.py (`<name>.snap`) instead of JSON.
+    Reads use whichever of the two snapshot files is newer, so switching
+    formats picks up the existing data.
+
+    A collection stored as a JSON mapping (the users) passes the field that
+    holds the mapping key as `key`; its change records carry that field
+    and the snapshot stays a mapping without it.
+
+    Several processes can share the files. Writes and log reads hold an
+    exclusive lock on `<name>.lock`. Every change record carries a sequence
+    number, and the highest sequence number seen is the store `version`;
+    the version folded into the snapshot is kept in `<name>.meta.json`.
+    Each log file starts with a header naming it, so `poll_changes` can
+    return just the records other processes appended since this one last
+    looked; the last compacted log is kept as `<log>.previous` so that
+    still works for a reader one compaction behind.
+
+    Reads and writes are timed and their sizes counted in metrics.REGISTRY
+    under "datastore.*".
+    """
+
+    def __init__(self, file_path="data/inventory.json", compact_threshold=1000, snapshot_format="json", key="id"):
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
         self.file_path = file_path
+        self.key = key
+        self.snapshot_format = snapshot_format
+        self.binary_path = f"{os.path.splitext(file_path)[0]}.snap"
+        self.log_path = f"{os.path.splitext(file_path)[0]}.changes.jsonl"
+        self.sealed_log_path = f"{self.log_path}.compacting"
+        self.previous_log_path = f"{self.log_path}.previous"
+        self.meta_path = f"{os.path.splitext(file_path)[0]}.meta.json"
+        self.file_lock = FileLock(f"{os.path.splitext(file_path)[0]}.lock")
+        self.compact_threshold = compact_threshold
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._compaction_thread = None
+        self._log_records = 0
+        self.version = 0
+        # (log id, byte offset) read up to in the active log, and its last stat
+        self._log_position = None
+        self._log_stat = None
+        # Records of other processes read while appending, not yet returned by poll_changes
+        self._unseen = []
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+
+    def lock(self):
+        """Context manager holding the cross-process lock (re-entrant)."""
+        return self.file_lock
 
     def load_data(self):
-        """Load inventory data from the JSON file."""
+        """Load inventory data from the JSON snapshot and replay the change log."""
+        with timed("datastore.load_data"):
+            return self._load_data()
+
+    def _load_data(self):
+        with self.file_lock, self._lock:
+            data = self._read_snapshot()
+            records = self._read_logs()
+        if not records:
+            return data
+
+        self.logger.info("Replaying %s change(s) over %s", len(records), self.file_path)
+        return self._replay(data, records)
+
+    def iter_items(self):
+        """Stream items from the snapshot, applying the change log on the fly.
+
+        Only the (compacted, hence small) change log is held in memory; the
+        snapshot array is decoded one item at a time.
+        """
+        with timed("datastore.iter_items"):
+            yield from self._iter_items()
+
+    def _iter_items(self):
+        with self.file_lock, self._lock:
+            records = self._read_logs()
+        changed = {}
+        deleted = set()
+        for record in records:
+            if record.get("op") == "delete":
+                deleted.add(record["id"])
+                changed.pop(record["id"], None)
+            else:
+                deleted.discard(record["item"]["id"])
+                changed[record["item"]["id"]] = record["item"]
+
+        for item in self._iter_snapshot():
+            if item["id"] in deleted:
+                continue
+            yield changed.pop(item["id"], item)
+        yield from changed.values()
+
+    def load_columns(self):
+        """Load the items into a ColumnarItems table straight from the binary snapshot's columns.
+
+        Returns None when there is no current binary snapshot. The change
+        log is applied to the table afterwards.
+        """
+        with timed("datastore.load_columns"):
+            with self.file_lock, self._lock:
+                if not self._binary_snapshot_is_current():
+                    return None
+                records = self._read_logs()
+                with BinarySnapshot(self.binary_path) as snapshot:
+                    items = ColumnarItems.from_snapshot(snapshot)
+            count("datastore.bytes_read", os.path.getsize(self.binary_path))
+            for record in records:
+                if record.get("op") == "delete":
+                    if record["id"] in items:
+                        items.pop(record["id"])
+                else:
+                    items[record["item"]["id"]] = record["item"]
+            return items
+
+    def _binary_snapshot_is_current(self):
+        if not os.path.exists(self.binary_path):
+            return False
+        if not os.path.exists(self.file_path):
+            return True
+        return os.path.getmtime(self.binary_path) >= os.path.getmtime(self.file_path)
+
+    def _iter_snapshot(self, chunk_size=1 << 16):
+        if self._binary_snapshot_is_current():
+            with BinarySnapshot(self.binary_path) as snapshot:
+                count("datastore.bytes_read", os.path.getsize(self.binary_path))
+                yield from snapshot
+            return
+        if not os.path.exists(self.file_path):
+            return
+        decoder = json.JSONDecoder()
+        with open(self.file_path, "r") as file:
+            buffer = ""
+            position = 0
+            started = False
+            for chunk in iter(lambda: file.read(chunk_size), ""):
+                count("datastore.bytes_read", len(chunk))
+                buffer = buffer[position:] + chunk
+                position = 0
+                while True:
+                    while position < len(buffer) and buffer[position] in " \t\r\n,":
+                        position += 1
+                    if position >= len(buffer):
+                        break
+                    if not started:
+                        if buffer[position] != "[":
+                            raise ValueError(f"{self.file_path} does not contain a JSON array.")
+                        started = True
+                        position += 1
+                        continue
+                    if buffer[position] == "]":
+                        return
+                    try:
+                        item, position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        break  # Item continues in the next chunk
+                    yield item
+
+    def _read_logs(self):
+        """Read both logs in full and reset the change tracking to their end (locks held)."""
+        records, _ = self._read_log_from(self.sealed_log_path)
+        active, end = self._read_log_from(self.log_path)
+        self._log_records = len(active)
+        records.extend(active)
+        self.version = max([self._read_meta_version()] + [record.get("seq", 0) for record in records])
+        self._log_position = (self._log_id(self.log_path), end) if os.path.exists(self.log_path) else None
+        self._log_stat = self._stat_log()
+        self._unseen = []
+        return records
+
+    def save_data(self, data):
+        """Save inventory data as a full snapshot and discard the change log.
+
+        This replaces the whole collection, including changes other
+        processes made since it was loaded; they see a new version and
+        reload.
+        """
+        # The compaction thread needs the file lock to finish, so it cannot be
+        # joined while this thread holds it. It is safe not to: it writes to
+        # its own temporary file and discards its result once it sees the
+        # sealed log gone.
+        if not self.file_lock.held_by_current_thread():
+            self.wait_for_compaction()
+        with timed("datastore.save_data"), self.file_lock, self._lock:
+            self._catch_up()
+            self._write_snapshot(data)
+            for path in (self.previous_log_path, self.sealed_log_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._log_records = 0
+            self.version += 1
+            self._write_meta_version(self.version)
+            self._log_position = None
+            self._log_stat = None
+            self._unseen = []
+        self.logger.info("Data saved to %s", self.file_path)
+
+    def append_changes(self, changes):
+        """Append several (op, item) records to the change log in one write."""
+        for op, _ in changes:
+            if op not in ("add", "update", "delete"):
+                raise ValueError(f"Unknown change operation: {op}")
+        if not changes:
+            return
+
+        with timed("datastore.append_changes"), self.file_lock, self._lock:
+            # Sequence numbers continue from whatever other processes wrote
+            unseen = self._catch_up()
+            if unseen is None:
+                # The snapshot was replaced: continue from its version and
+                # have the next poll_changes ask for a reload
+                self._read_logs()
+                self._unseen = None
+            elif self._unseen is not None:
+                self._unseen.extend(unseen)
+            lines = []
+            if not os.path.exists(self.log_path) or not os.path.getsize(self.log_path):
+                lines.append(json.dumps({"op": "begin", "log": uuid.uuid4().hex}) + "\n")
+            elif self._log_is_torn():
+                # End the record a crash cut short, or ours would be appended to it
+                lines.append("\n")
+            for op, item in changes:
+                self.version += 1
+                if op == "delete":
+                    record = {"op": op, self.key: item[self.key], "seq": self.version}
+                else:
+                    record = {"op": op, "item": item, "seq": self.version}
+                lines.append(json.dumps(record, separators=(",", ":")) + "\n")
+            payload = "".join(lines)
+            with open(self.log_path, "a") as file:
+                file.write(payload)
+                file.flush()
+                os.fsync(file.fileno())
+                end = file.tell()
+            self._log_position = (self._log_id(self.log_path), end)
+            self._log_stat = self._stat_log()
+            self._log_records += len(changes)
+            should_compact = self._log_records >= self.compact_threshold
+        count("datastore.bytes_written", len(payload))
+        count("datastore.changes_appended", len(changes))
+        self.logger.info("Appended %s change(s) to %s", len(changes), self.log_path)
+
+        if should_compact:
+            self.compact()
+
+    def poll_changes(self):
+        """Return the change records other processes wrote since the last load or poll.
+
+        Records are dicts with "op", "seq" and "item" (or just the `key`
+        field, e.g. "id", for deletes), oldest first. Returns None when some
+        of them were already folded into a new snapshot (or the snapshot
+        was replaced) and can no longer be read incrementally; the caller
+        then has to reload.
+        """
+        with self.file_lock, self._lock:
+            records = self._catch_up()
+            if records is None or self._unseen is None:
+                return None
+            records, self._unseen = self._unseen + records, []
+        return records
+
+    def read_position(self):
+        with self._lock:
+            return {
+                "version": self.version, "log_position": self._log_position,
+                "log_stat": self._log_stat, "log_records": self._log_records,
+            }
+
+    def resume_from(self, position):
+        with self._lock:
+            self.version = position["version"]
+            self._log_position = position["log_position"]
+            self._log_stat = position["log_stat"]
+            self._log_records = position["log_records"]
+            self._unseen = []
+
+    def _catch_up(self):
+        """Read new records of other processes and advance the version (locks held)."""
+        stat = self._stat_log()
+        if stat is not None and stat == self._log_stat and not os.path.exists(self.sealed_log_path):
+            return []
+        active_id = self._log_id(self.log_path)
+        if self._log_position is not None and self._log_position[0] == active_id:
+            records, end = self._read_log_from(self.log_path, self._log_position[1])
+        else:
+            # Our log was rotated for compaction, and maybe compacted since
+            position_id = self._log_position[0] if self._log_position is not None else None
+            if position_id is not None and self._log_id(self.sealed_log_path) == position_id:
+                records, _ = self._read_log_from(self.sealed_log_path, self._log_position[1])
+            elif position_id is not None and self._log_id(self.previous_log_path) == position_id:
+                records, _ = self._read_log_from(self.previous_log_path, self._log_position[1])
+                records.extend(self._read_log_from(self.sealed_log_path)[0])
+            elif self._read_meta_version() > self.version:
+                return None
+            else:
+                records, _ = self._read_log_from(self.sealed_log_path)
+            active, end = self._read_log_from(self.log_path)
+            records.extend(active)
+        self._log_position = (active_id, end) if active_id is not None else None
+        self._log_stat = stat
+        records = [record for record in records if record.get("seq", 0) > self.version]
+        if records:
+            self.version = records[-1]["seq"]
+        return records
+
+    def _log_is_torn(self):
+        """Whether the active log ends without a newline, i.e. mid-record (locks held)."""
+        with open(self.log_path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b"\n"
+
+    def _stat_log(self):
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _log_id(self, path):
+        """ID from a log's header line; "" for logs written before headers, None if missing."""
+        try:
+            with open(path, "r") as file:
+                first = file.readline()
+        except FileNotFoundError:
+            return None
+        try:
+            header = json.loads(first)
+        except json.JSONDecodeError:
+            return ""
+        return header.get("log", "") if header.get("op") == "begin" else ""
+
+    def _read_meta_version(self):
+        try:
+            with open(self.meta_path, "r") as file:
+                return json.load(file).get("version", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+
+    def _write_meta_version(self, version):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"version": version}, file)
+        os.replace(tmp_path, self.meta_path)
+
+    def compact(self, wait=False):
+        """Fold the change log into a new snapshot on a background thread."""
+        with self.file_lock, self._lock:
+            running = self._compaction_thread and self._compaction_thread.is_alive()
+            if not running:
+                # A sealed log left over from an interrupted compaction is
+                # folded first; the active log is rotated on the next run.
+                if not os.path.exists(self.sealed_log_path) and os.path.exists(self.log_path):
+                    os.replace(self.log_path, self.sealed_log_path)
+                    self._log_records = 0
+                if os.path.exists(self.sealed_log_path):
+                    self._compaction_thread = threading.Thread(
+                        target=self._compact_sealed_log, name="datastore-compaction", daemon=True
+                    )
+                    self._compaction_thread.start()
+        if wait:
+            self.wait_for_compaction()
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished."""
+        thread = self._compaction_thread
+        if thread and thread.is_alive():
+            thread.join()
+
+    def _compact_sealed_log(self):
+        # The sealed log and the snapshot only change under the file lock, so
+        # they are read without it and the result is installed only if
+        # nobody else compacted or replaced the snapshot in the meantime.
+        try:
+            with timed("datastore.compact"):
+                sealed_id = self._log_id(self.sealed_log_path)
+                base_version = self._read_meta_version()
+                records, _ = self._read_log_from(self.sealed_log_path)
+                data = self._replay(self._read_snapshot(), records)
+                tmp_path, path = self._prepare_snapshot(data)
+                with self.file_lock, self._lock:
+                    if self._log_id(self.sealed_log_path) != sealed_id or self._read_meta_version() != base_version:
+                        os.remove(tmp_path)
+                        self.logger.info("Change log of %s was already compacted elsewhere", self.file_path)
+                        return
+                    os.replace(tmp_path, path)
+                    versions = [record.get("seq", 0) for record in records]
+                    self._write_meta_version(max([base_version] + versions))
+                    # Kept for readers that have not caught up with it yet
+                    os.replace(self.sealed_log_path, self.previous_log_path)
+            self.logger.info("Compacted change log into %s", self.file_path)
+        except Exception as e:
+            self.logger.error("Error compacting change log for %s: %s", self.file_path, e)
+
+    def _replay(self, data, records):
+        # Records carry whole items, so replaying a record twice (e.g. after
+        # a crash between snapshot rename and log removal) is harmless.
+        if self.key != "id":
+            mapping = dict(data or {})
+            for record in records:
+                if record.get("op") == "delete":
+                    mapping.pop(record[self.key], None)
+                else:
+                    entry = dict(record["item"])
+                    mapping[entry.pop(self.key)] = entry
+            return mapping
+        items = {item["id"]: item for item in data}
+        for record in records:
+            if record.get("op") == "delete":
+                items.pop(record["id"], None)
+            else:
+                item = record["item"]
+                items[item["id"]] = item
+        return list(items.values())
+
+    def _read_snapshot(self):
+        if self._binary_snapshot_is_current():
+            self.logger.info("Loading data from %s", self.binary_path)
+            try:
+                with BinarySnapshot(self.binary_path) as snapshot:
+                    data = list(snapshot)
+                count("datastore.bytes_read", os.path.getsize(self.binary_path))
+                self.logger.info("Data loaded successfully.")
+                return data
+            except ValueError as e:
+                self.logger.error("Error loading data from %s: %s", self.binary_path, e)
+                return []
         if os.path.exists(self.file_path):
-            self.logger.info(f"Loading data from {self.file_path}")
+            self.logger.info("Loading data from %s", self.file_path)
             with open(self.file_path, "r") as file:
                 try:
                     data = json.load(file)
+                    count("datastore.bytes_read", file.tell())
                     self.logger.info("Data loaded successfully.")
                     return data
                 except json.JSONDecodeError:
-                    self.logger.error(f"Error loading data from {self.file_path}: Invalid JSON format.")
+                    self.logger.error("Error loading data from %s: Invalid JSON format.", self.file_path)
                     return []
         else:
-            self.logger.warning(f"File not found: {self.file_path}. Starting with empty inventory.")
+            self.logger.warning("File not found: %s. Starting with empty inventory.", self.file_path)
         return []
 
-    def save_data(self, data):
-        """Save inventory data to the JSON file."""
-        with open(self.file_path, "w") as file:
+    def _read_log_from(self, path, offset=0):
+        """Return (change records after byte offset, end offset); headers are skipped."""
+        records = []
+        if not os.path.exists(path):
+            return records, 0
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last record can be torn by a crash mid-append.
+                self.logger.warning("Skipping corrupt change record in %s", path)
+                continue
+            if record.get("op") != "begin":
+                records.append(record)
+        count("datastore.bytes_read", len(data))
+        return records, offset + len(data)
+
+    def _write_snapshot(self, data):
+        """Write the snapshot to a temporary file and atomically rename it."""
+        tmp_path, path = self._prepare_snapshot(data)
+        os.replace(tmp_path, path)
+
+    def _prepare_snapshot(self, data):
+        """Write a snapshot to a temporary file; returns (temporary path, final path)."""
+        if self.snapshot_format == "binary":
+            tmp_path = f"{self.binary_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            write_snapshot(tmp_path, data)
+            count("datastore.bytes_written", os.path.getsize(tmp_path))
+            return tmp_path, self.binary_path
+        tmp_path = f"{self.file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
             json.dump(data, file, indent=4)
-        self.logger.info(f"Data saved to {self.file_path}")
+            file.flush()
+            os.fsync(file.fileno())
+            count("datastore.bytes_written", file.tell())
+        return tmp_path, self.file_path
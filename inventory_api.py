@@ -0,0 +1,522 @@
+from collections import OrderedDict
+import threading
+from storage import ReadOnlyError, create_datastore
+from inventory_store import InventoryStore
+from aggregates import InventoryAggregates, ShardedAggregates
+from timeseries import ValueHistory
+import config
+import logging
+import math
+import os
+
+class ItemNotFoundError(LookupError):
+    """Raised when an operation refers to an item ID that does not exist."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item with ID {item_id} not found.")
+        self.item_id = item_id
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a stock change would make a quantity negative or below what is reserved."""
+
+
+class ConflictError(ValueError):
+    """Raised when an edit clashes with a change someone else made to the same item."""
+
+    def __init__(self, item_id, message):
+        super().__init__(message)
+        self.item_id = item_id
+
+
+class InventoryAPI:
+    """Programmatic inventory operations, free of any prompt or console code.
+
+    Mutations are applied to the in-memory store immediately. They are
+    persisted right away unless `batch_writes` is set, in which case edits,
+    deletes and stock changes are coalesced per item until `flush()` writes
+    them in one batch (adds are still written at once, see `_persist`).
+
+    Mutations hold an internal lock, so the API can be shared between
+    threads; `start_flusher()` then persists coalesced changes from a
+    background thread in grouped commits. A change another process
+    persists to an item with coalesced changes is not overwritten: the
+    local quantity and reservation changes are re-applied to it as deltas,
+    and other locally edited fields keep their local values.
+
+    Every mutation also offers a sample of the totals to `history` (a
+    timeseries.ValueHistory). When no datastore is passed, the history kept
+    in DATA_DIR/history is used; otherwise only an explicitly passed one.
+
+    Several processes can share one datastore. Each mutation holds the
+    datastore's cross-process lock and first applies the changes other
+    processes logged since the last one (`refresh()` does the same on
+    demand), so only the delta is read. Every item carries a "version"
+    that grows with each change; `update_item` with an `expected_version`
+    merges edits made against an older version when they touch different
+    fields and raises ConflictError when they do not.
+    """
+
+    EDITABLE_FIELDS = ("name", "category", "quantity", "price", "reorder_point", "warehouse")
+    STOCK_FIELDS = ("quantity", "reserved")
+    REMEMBERED_OPERATIONS = 100_000
+    REMEMBERED_REVISIONS = 10_000
+
+    def __init__(self, datastore=None, batch_writes=False, compact=None, history=None):
+        if history is None and datastore is None:
+            history = ValueHistory(os.path.join(config.DATA_DIR, "history"), config.HISTORY_INTERVAL)
+        self.history = history
+        self.datastore = datastore or create_datastore("inventory")
+        self.compact = config.COMPACT_MEMORY if compact is None else compact
+        self.next_id = 1
+        self._pending = OrderedDict()
+        # Pending items as they were before their first coalesced change
+        self._pending_bases = {}
+        # Items as they were before each change, keyed by (ID, version), to merge stale edits
+        self._revisions = OrderedDict()
+        self._load_store()
+        self.batch_writes = batch_writes
+        self._lock = threading.RLock()
+        self._applied_operations = OrderedDict()
+        self._flusher = None
+        self._stop_flusher = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+        self._record_history()
+
+    def _load_store(self):
+        # The compact store is built from the binary snapshot's columns when
+        # there is one, else filled row by row from a stream; either way the
+        # full list of item dicts is never materialized.
+        if self.compact:
+            load_columns = getattr(self.datastore, "load_columns", None)
+            items = load_columns() if load_columns else None
+            if items is None:
+                items = self.datastore.iter_items()
+        else:
+            items = self.datastore.load_data()
+        self.store = InventoryStore(items, compact=self.compact)
+        self.aggregates = InventoryAggregates()
+        self.store.add_index("aggregates", self.aggregates)
+        # Sharded backends (sharded_store.py) also get running totals per shard
+        self.shard_aggregates = None
+        if hasattr(self.datastore, "shard_of"):
+            self.shard_aggregates = ShardedAggregates(self.datastore.shard_of, self.datastore.shard_names)
+            self.store.add_index("shard_aggregates", self.shard_aggregates)
+        self.next_id = max(self.next_id, self._get_next_id())
+
+    def _reload(self):
+        """Reload everything from the datastore, keeping local changes that are not persisted yet."""
+        self.logger.info("Inventory changed on disk; reloading it")
+        pending = [(op, dict(item)) for op, item in self._pending.values()]
+        self._load_store()
+        self._pending = OrderedDict()
+        for op, item in pending:
+            current = self.store.get(item["id"])
+            if op == "delete":
+                if current is not None:
+                    self.store.remove(item["id"])
+                self._pending[item["id"]] = (op, item)
+            elif current is None:
+                self._drop_pending(item["id"])
+            else:
+                self._rebase_pending(item, dict(current))
+        self.next_id = max(self.next_id, self._get_next_id())
+
+    def refresh(self):
+        """Apply changes other processes made; returns the number applied, or None after a full reload."""
+        with self._lock, self.datastore.lock():
+            return self._sync()
+
+    def _sync(self):
+        # Called with the datastore lock held, so nothing can be appended meanwhile
+        records = self.datastore.poll_changes()
+        if records is None:
+            self._reload()
+            return None
+        for record in records:
+            item_id = record["id"] if record["op"] == "delete" else record["item"]["id"]
+            pending = self._pending.get(item_id)
+            if pending is not None and pending[0] == "delete":
+                # Deleted here; the delete is persisted on the next flush
+                continue
+            if pending is not None:
+                if record["op"] == "delete":
+                    self.store.remove(item_id)
+                    self._drop_pending(item_id)
+                else:
+                    self._remember(pending[1])
+                    self._rebase_pending(dict(pending[1]), record["item"])
+                continue
+            current = self.store.get(item_id)
+            if current is not None:
+                self._remember(current)
+            if record["op"] == "delete":
+                if current is not None:
+                    self.store.remove(item_id)
+            elif current is None:
+                self.store.add(record["item"])
+            else:
+                self.store.update(item_id, record["item"])
+            self.next_id = max(self.next_id, item_id + 1)
+        if records:
+            self.logger.info("Applied %s change(s) made by other processes", len(records))
+            self._record_history()
+        return len(records)
+
+    def _rebase_pending(self, item, current):
+        """Re-apply the coalesced changes of an item on top of its newer persisted state."""
+        base = self._pending_bases[item["id"]]
+        rebased = dict(current)
+        for field in set(item) | set(base):
+            if field == "version" or item.get(field) == base.get(field):
+                continue
+            if field in self.STOCK_FIELDS:
+                rebased[field] = current.get(field, 0) + item.get(field, 0) - base.get(field, 0)
+            elif field in item:
+                rebased[field] = item[field]
+            else:
+                rebased.pop(field, None)
+        rebased["version"] = current.get("version", 0) + item.get("version", 0) - base.get("version", 0)
+        if rebased["quantity"] < rebased.get("reserved", 0):
+            self.logger.warning(
+                "Item %s has %s units for %s reserved after merging changes made elsewhere",
+                item["id"], rebased["quantity"], rebased.get("reserved", 0),
+            )
+        self.store.update(item["id"], rebased)
+        self._pending_bases[item["id"]] = dict(current)
+        self._pending[item["id"]] = ("update", self.store.get(item["id"]))
+
+    def _drop_pending(self, item_id):
+        self.logger.warning("Item %s was deleted by another process; dropping its unsaved changes", item_id)
+        self._pending.pop(item_id, None)
+        self._pending_bases.pop(item_id, None)
+
+    def _check_writable(self):
+        # Refuse before touching the in-memory store, not when persisting
+        if self.datastore.read_only:
+            raise ReadOnlyError()
+
+    def _remember(self, item):
+        """Keep a copy of an item as it is before a change."""
+        key = (item["id"], item.get("version", 0))
+        self._revisions[key] = dict(item)
+        self._revisions.move_to_end(key)
+        if len(self._revisions) > self.REMEMBERED_REVISIONS:
+            self._revisions.popitem(last=False)
+
+    @property
+    def version(self):
+        """Version of the whole inventory (an ETag for it); grows with every change seen."""
+        return self.datastore.version
+
+    @property
+    def inventory(self):
+        """Live view of all items, in ID order."""
+        return self.store.items()
+
+    def verify_aggregates(self):
+        """Check the running aggregates against a full recount, rebuilding them if needed."""
+        return self.aggregates.check_consistency(self.inventory)
+
+    def _get_next_id(self):
+        """Get the next ID based on existing data."""
+        return self.store.max_id() + 1
+
+    def _validate_positive_number(self, value, field_name):
+        """Ensure the input is a positive number."""
+        try:
+            value = float(value)
+            if value < 0 or not math.isfinite(value):
+                raise ValueError
+            return value
+        except (TypeError, ValueError):
+            raise ValueError(f"{field_name} must be a positive number.")
+
+    def _validate_reorder_point(self, value):
+        """An empty reorder point disables reorder alerts for the item."""
+        if value in ("", None):
+            return None
+        return int(self._validate_positive_number(value, "Reorder point"))
+
+    def validate_item_fields(self, name, category, quantity, price, reorder_point=None, warehouse=None):
+        """Validate raw field values and return them as an item dict without an ID."""
+        if not isinstance(name, str) or not isinstance(category, str):
+            raise ValueError("Name and category must be text.")
+        item = {
+            "name": name,
+            "category": category,
+            "quantity": int(self._validate_positive_number(quantity, "Quantity")),
+            "price": float(self._validate_positive_number(price, "Price")),
+        }
+        reorder_point = self._validate_reorder_point(reorder_point)
+        if reorder_point is not None:
+            item["reorder_point"] = reorder_point
+        if warehouse not in (None, ""):
+            if not isinstance(warehouse, str):
+                raise ValueError("Warehouse must be text.")
+            item["warehouse"] = warehouse
+        shard_of = getattr(self.datastore, "shard_of", None)
+        if shard_of is not None:
+            shard_of(item)  # Rejects warehouses that have no shard
+        return item
+
+    def _record_history(self):
+        if self.history is None:
+            return
+        try:
+            self.history.observe(self.aggregates)
+        except OSError as e:
+            self.logger.error("Error recording inventory history: %s", e)
+
+    def _persist(self, changes, apply):
+        """Make a change in memory with apply() and persist it; returns what apply() returns.
+
+        `changes` are (op, item as it will be) pairs. Unbatched changes are
+        written first, so if that fails the in-memory store is left as it was.
+        Adds are never batched: their IDs were allocated under the datastore
+        lock from what is on disk, so they must be on disk before the lock is
+        released or another process could hand out the same IDs.
+        """
+        if self.batch_writes and all(op != "add" for op, _ in changes):
+            for _, item in changes:
+                if item["id"] not in self._pending_bases:
+                    self._pending_bases[item["id"]] = dict(self.store.get(item["id"]))
+            result = apply()
+            for op, item in changes:
+                # Later changes to the same item supersede earlier ones.
+                self._pending.pop(item["id"], None)
+                self._pending[item["id"]] = (op, self.store.get(item["id"]) or item)
+        else:
+            self.datastore.append_changes(changes)
+            result = apply()
+        self._record_history()
+        return result
+
+    def pending_writes(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Persist all coalesced changes in one batch; returns the number written.
+
+        Changes other processes persisted meanwhile are applied first, so the
+        coalesced items are written on top of them rather than over them.
+        """
+        with self._lock, self.datastore.lock():
+            if not self._pending:
+                return 0
+            self._sync()
+            changes = [(op, dict(item)) for op, item in self._pending.values()]
+            if changes:
+                self.datastore.append_changes(changes)
+            self._pending = OrderedDict()
+            self._pending_bases = {}
+            return len(changes)
+
+    def start_flusher(self, interval=0.05):
+        """Coalesce writes and persist them from a background thread every `interval` seconds."""
+        with self._lock:
+            self.batch_writes = True
+            if self._flusher and self._flusher.is_alive():
+                return
+            self._stop_flusher.clear()
+            self._flusher = threading.Thread(
+                target=self._run_flusher, args=(interval,), name="inventory-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def stop_flusher(self):
+        """Stop the background flusher and persist whatever is still pending."""
+        self._stop_flusher.set()
+        if self._flusher:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def _run_flusher(self, interval):
+        while not self._stop_flusher.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error("Error flushing inventory changes: %s", e)
+
+    def add_items(self, items):
+        """Assign consecutive IDs to validated items and persist them in one write."""
+        with self._lock, self.datastore.lock():
+            self._check_writable()
+            self._sync()
+            new_items = [{"id": self.next_id + offset, **item, "version": 1} for offset, item in enumerate(items)]
+            added = self._persist([("add", item) for item in new_items], lambda: self.store.add_many(new_items))
+            self.next_id += len(added)
+            return added
+
+    def create_item(self, name, category, quantity, price, reorder_point=None, warehouse=None):
+        """Validate and add a single item; returns the stored item."""
+        return self.add_items([self.validate_item_fields(name, category, quantity, price, reorder_point, warehouse)])[0]
+
+    def get_item(self, item_id):
+        item = self.store.get(item_id)
+        if item is None:
+            raise ItemNotFoundError(item_id)
+        return item
+
+    def update_item(self, item_id, expected_version=None, **fields):
+        """Validate and apply the given field changes; returns the updated item.
+
+        `expected_version` is the item version the edit was based on. If the
+        item has changed since, only the fields the edit actually changes
+        are applied on top, unless someone else changed one of them to a
+        different value, which raises ConflictError.
+        """
+        unknown = set(fields) - set(self.EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        with self._lock, self.datastore.lock():
+            self._check_writable()
+            self._sync()
+            item = self.get_item(item_id)
+            if expected_version is not None and expected_version != item.get("version", 0):
+                fields = self._merge_stale_edit(item, expected_version, fields)
+            merged = {field: item.get(field) for field in self.EDITABLE_FIELDS}
+            merged.update(fields)
+            changes = self.validate_item_fields(**merged)
+            changes.setdefault("reorder_point", None)
+            if changes["quantity"] < item.get("reserved", 0):
+                raise InsufficientStockError(
+                    f"Quantity cannot drop below the {item['reserved']} units reserved for item {item_id}."
+                )
+            self._remember(item)
+            changes["version"] = item.get("version", 0) + 1
+            return self._persist([("update", {**item, **changes})], lambda: self.store.update(item_id, changes))
+
+    def _merge_stale_edit(self, item, expected_version, fields):
+        """Fields of an edit based on an older version that still apply to the item as it is now."""
+        base = self._revisions.get((item["id"], expected_version))
+        if base is None:
+            raise ConflictError(
+                item["id"], f"Item {item['id']} was changed by someone else (now version {item.get('version', 0)}); reload it and try again."
+            )
+        edited = {field: value for field, value in fields.items() if value != base.get(field)}
+        clashes = sorted(
+            field for field, value in edited.items()
+            if item.get(field) != base.get(field) and item.get(field) != value
+        )
+        if clashes:
+            raise ConflictError(
+                item["id"], f"Item {item['id']} was changed by someone else ({', '.join(clashes)}); reload it and try again."
+            )
+        return edited
+
+    def remove_item(self, item_id):
+        """Delete an item; returns the removed item."""
+        with self._lock, self.datastore.lock():
+            self._check_writable()
+            self._sync()
+            item = dict(self.get_item(item_id))
+            return self._persist([("delete", item)], lambda: self.store.remove(item_id))
+
+    def _positive_amount(self, amount):
+        if isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+            raise ValueError("Amount must be a positive whole number.")
+        return amount
+
+    def _apply_stock_change(self, item_id, op_id, compute):
+        """Apply compute(item) -> field changes atomically, at most once per op_id.
+
+        Applied op_ids are remembered by this InventoryAPI instance only (the
+        last REMEMBERED_OPERATIONS of them), so a retry is deduplicated only
+        when it reaches the same process before it restarts. Reusing an
+        op_id for a different item raises ValueError.
+        """
+        with self._lock, self.datastore.lock():
+            if op_id is not None and op_id in self._applied_operations:
+                applied_to = self._applied_operations[op_id]
+                if applied_to != item_id:
+                    raise ValueError(f"Operation {op_id} was already applied to item {applied_to}, not item {item_id}.")
+                return self.get_item(item_id)
+            self._check_writable()
+            self._sync()
+            item = self.get_item(item_id)
+            changes = compute(item)
+            self._remember(item)
+            changes["version"] = item.get("version", 0) + 1
+            item = self._persist([("update", {**item, **changes})], lambda: self.store.update(item_id, changes))
+            if op_id is not None:
+                self._applied_operations[op_id] = item_id
+                if len(self._applied_operations) > self.REMEMBERED_OPERATIONS:
+                    self._applied_operations.popitem(last=False)
+            return item
+
+    def adjust_quantity(self, item_id, delta, op_id=None):
+        """Add delta (negative to remove) to an item's quantity.
+
+        Refuses to take the quantity below zero or below the reserved units.
+        Retrying with the same op_id does not apply the change twice.
+        """
+        if isinstance(delta, bool) or not isinstance(delta, int):
+            raise ValueError("Delta must be a whole number.")
+
+        def compute(item):
+            quantity = item["quantity"] + delta
+            if quantity < item.get("reserved", 0):
+                raise InsufficientStockError(
+                    f"Cannot adjust item {item_id} by {delta}: {item['quantity']} in stock, "
+                    f"{item.get('reserved', 0)} reserved."
+                )
+            return {"quantity": quantity}
+
+        return self._apply_stock_change(item_id, op_id, compute)
+
+    def reserve(self, item_id, amount, op_id=None):
+        """Set aside units for an order; refuses if fewer are available."""
+        amount = self._positive_amount(amount)
+
+        def compute(item):
+            reserved = item.get("reserved", 0)
+            if item["quantity"] - reserved < amount:
+                raise InsufficientStockError(
+                    f"Cannot reserve {amount} of item {item_id}: only {item['quantity'] - reserved} available."
+                )
+            return {"reserved": reserved + amount}
+
+        return self._apply_stock_change(item_id, op_id, compute)
+
+    def release(self, item_id, amount, op_id=None):
+        """Return reserved units to available stock (e.g. a cancelled order)."""
+        amount = self._positive_amount(amount)
+
+        def compute(item):
+            reserved = item.get("reserved", 0)
+            if reserved < amount:
+                raise InsufficientStockError(f"Cannot release {amount} of item {item_id}: only {reserved} reserved.")
+            return {"reserved": reserved - amount}
+
+        return self._apply_stock_change(item_id, op_id, compute)
+
+    def fulfil(self, item_id, amount, op_id=None):
+        """Ship reserved units: removes them from both the reservation and the stock."""
+        amount = self._positive_amount(amount)
+
+        def compute(item):
+            reserved = item.get("reserved", 0)
+            if reserved < amount:
+                raise InsufficientStockError(f"Cannot fulfil {amount} of item {item_id}: only {reserved} reserved.")
+            return {"quantity": item["quantity"] - amount, "reserved": reserved - amount}
+
+        return self._apply_stock_change(item_id, op_id, compute)
+
+    def find_items(self, name=None, category=None, min_price=None, max_price=None, limit=None):
+        """Search by name or category substring, or by price range.
+
+        Returns (ranked items, total matches). Exactly one kind of criterion
+        must be given; an open price bound defaults to 0 or infinity.
+        """
+        if name is not None:
+            return self.store.search_name(name, limit)
+        if category is not None:
+            return self.store.search_category(category, limit)
+        if min_price is not None or max_price is not None:
+            lower = 0.0 if min_price is None else float(min_price)
+            upper = float("inf") if max_price is None else float(max_price)
+            return self.store.find_price_between(lower, upper, limit)
+        raise ValueError("Give a name, a category or a price range to search by.")
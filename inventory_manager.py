@@ -1,59 +1,43 @@
-from rich.table import Table
 from rich.console import Console
-from datastore import DataStore
+from inventory_api import InventoryAPI, ItemNotFoundError
+from pager import PAGE_SIZE, ItemPager
 from prompt_toolkit import prompt
 from prompt_toolkit.completion import WordCompleter
 import logging
 
-class InventoryManager:
-    def __init__(self):
-        self.datastore = DataStore()
-        self.inventory = self.datastore.load_data()
-        self.next_id = self._get_next_id()
+class InventoryManager(InventoryAPI):
+    """Interactive prompt front end over InventoryAPI."""
+
+    SEARCH_RESULT_LIMIT = 100
+    SORT_OPTIONS = ("id", "quantity", "price", "value")
+
+    def __init__(self, datastore=None, compact=None, history=None):
+        super().__init__(datastore, compact=compact, history=history)
         self.console = Console()
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
 
-    def _get_next_id(self):
-        """Get the next ID based on existing data."""
-        if not self.inventory:
-            return 1
-        return max(item["id"] for item in self.inventory) + 1
-
     def view_items(self):
         if not self.inventory:
             self.console.print("[bold red]No items in inventory.[/bold red]")
             self.logger.info("Viewed inventory - No items found.")
             return
 
-        table = Table(title="Inventory Items")
-        table.add_column("ID", style="cyan", justify="center")
-        table.add_column("Name", style="green")
-        table.add_column("Category", style="magenta")
-        table.add_column("Quantity", justify="right")
-        table.add_column("Price", justify="right")
-
-        for item in self.inventory:
-            table.add_row(
-                str(item["id"]),
-                item["name"],
-                item["category"],
-                str(item["quantity"]),
-                f"${item['price']:.2f}"
-            )
-
-        self.console.print(table)
+        self.item_pager("id").browse(self.console, "Inventory Items", sort_options={
+            sort_by: (lambda sort_by=sort_by: self.item_pager(sort_by))
+            for sort_by in self.SORT_OPTIONS
+        })
         self.logger.info("Viewed inventory.")
 
-    def _validate_positive_number(self, value, field_name):
-        """Ensure the input is a positive number."""
-        try:
-            value = float(value)
-            if value < 0:
-                raise ValueError
-            return value
-        except ValueError:
-            raise ValueError(f"{field_name} must be a positive number.")
+    def warehouses(self):
+        """Warehouse names when the inventory is sharded by warehouse, else an empty list."""
+        if getattr(self.datastore, "shard_by", None) == "warehouse":
+            return self.datastore.shard_names
+        return []
+
+    def item_pager(self, sort_by="id", page_size=PAGE_SIZE):
+        """Keyset pager over the whole inventory in the given sort order."""
+        return ItemPager(self.store.sorted_entries(sort_by), self.store.get, page_size)
 
     def add_item(self):
         try:
@@ -61,60 +45,68 @@ class InventoryManager:
             category = input("Enter item category: ")
             quantity = self._validate_positive_number(input("Enter quantity: "), "Quantity")
             price = self._validate_positive_number(input("Enter price: "), "Price")
+            reorder_point = self._validate_reorder_point(input("Enter reorder point (optional): "))
+            warehouses = self.warehouses()
+            warehouse = input(f"Enter warehouse ({', '.join(warehouses)}): ") if warehouses else None
 
-            new_item = {
-                "id": self.next_id,
-                "name": name,
-                "category": category,
-                "quantity": int(quantity),
-                "price": float(price),
-            }
-            self.inventory.append(new_item)
-            self.datastore.save_data(self.inventory)
-            self.next_id += 1
+            new_item = self.validate_item_fields(name, category, quantity, price, reorder_point, warehouse)
+            new_item = self.add_items([new_item])[0]
 
             self.console.print("[bold green]Item added successfully![/bold green]")
-            self.logger.info(f"Added item: {new_item}")
+            self.logger.info("Added item with ID: %s", new_item["id"])
         except ValueError as e:
             self.console.print(f"[bold red]{e}[/bold red]")
-            self.logger.error(f"Error adding item: {e}")
+            self.logger.error("Error adding item: %s", e)
 
     def edit_item(self):
         try:
             item_id = int(input("Enter the ID of the item to edit: "))
-            for item in self.inventory:
-                if item["id"] == item_id:
-                    item["name"] = input(f"Enter new name ({item['name']}): ") or item["name"]
-                    item["category"] = input(f"Enter new category ({item['category']}): ") or item["category"]
-                    item["quantity"] = self._validate_positive_number(
-                        input(f"Enter new quantity ({item['quantity']}): ") or item["quantity"], "Quantity"
-                    )
-                    item["price"] = self._validate_positive_number(
-                        input(f"Enter new price ({item['price']}): ") or item["price"], "Price"
-                    )
-                    self.datastore.save_data(self.inventory)
-                    self.console.print("[bold green]Item updated successfully![/bold green]")
-                    self.logger.info(f"Updated item with ID: {item_id}")
-                    return
+            self.refresh()
+            item = self.store.get(item_id)
+            if item is None:
+                self.console.print("[bold red]Item not found.[/bold red]")
+                self.logger.warning("Tried to edit item with ID: %s - Not found.", item_id)
+                return
 
+            item = dict(item)  # The edit is based on the item as shown, even if it changes meanwhile
+            changes = {
+                "name": input(f"Enter new name ({item['name']}): ") or item["name"],
+                "category": input(f"Enter new category ({item['category']}): ") or item["category"],
+                "quantity": int(self._validate_positive_number(
+                    input(f"Enter new quantity ({item['quantity']}): ") or item["quantity"], "Quantity"
+                )),
+                "price": self._validate_positive_number(
+                    input(f"Enter new price ({item['price']}): ") or item["price"], "Price"
+                ),
+                "reorder_point": self._validate_reorder_point(
+                    input(f"Enter new reorder point ({item.get('reorder_point', 'none')}): ") or item.get("reorder_point")
+                ),
+            }
+            if self.warehouses():
+                changes["warehouse"] = input(f"Enter new warehouse ({item.get('warehouse', 'none')}): ") or item.get("warehouse")
+            self.update_item(item_id, expected_version=item.get("version", 0), **changes)
+            self.console.print("[bold green]Item updated successfully![/bold green]")
+            self.logger.info("Updated item with ID: %s", item_id)
+        except ItemNotFoundError:
+            # Deleted by another operator while the changes were being entered
             self.console.print("[bold red]Item not found.[/bold red]")
-            self.logger.warning(f"Tried to edit item with ID: {item_id} - Not found.")
+            self.logger.warning("Tried to edit item with ID: %s - Not found.", item_id)
         except ValueError as e:
             self.console.print(f"[bold red]{e}[/bold red]")
-            self.logger.error(f"Error editing item: {e}")
-    
+            self.logger.error("Error editing item: %s", e)
+
     def delete_item(self):
         item_id = int(input("Enter the ID of the item to delete: "))
-        for item in self.inventory:
-            if item["id"] == item_id:
-                self.inventory.remove(item)
-                self.datastore.save_data(self.inventory)
-                self.console.print("[bold green]Item deleted successfully![/bold green]")
-                self.logger.info(f"Deleted item with ID: {item_id}")
-                return
+        self.refresh()
+        try:
+            self.remove_item(item_id)
+        except ItemNotFoundError:
+            self.console.print("[bold red]Item not found.[/bold red]")
+            self.logger.warning("Tried to delete item with ID: %s - Not found.", item_id)
+            return
 
-        self.console.print("[bold red]Item not found.[/bold red]")
-        self.logger.warning(f"Tried to delete item with ID: {item_id} - Not found.")
+        self.console.print("[bold green]Item deleted successfully![/bold green]")
+        self.logger.info("Deleted item with ID: %s", item_id)
 
     def search_items(self):
         search_options = WordCompleter(
@@ -124,40 +116,27 @@ class InventoryManager:
         )
         search_by = prompt("Search by (name, category, price range): ", completer=search_options)
 
+        limit = self.SEARCH_RESULT_LIMIT
         if search_by.lower() == "name":
-            name = input("Enter the item name to search: ").lower()
-            results = [item for item in self.inventory if name in item["name"].lower()]
+            name = input("Enter the item name to search: ")
+            results, total = self.find_items(name=name, limit=limit)
         elif search_by.lower() == "category":
-            category = input("Enter the category to search: ").lower()
-            results = [item for item in self.inventory if category in item["category"].lower()]
+            category = input("Enter the category to search: ")
+            results, total = self.find_items(category=category, limit=limit)
         elif search_by.lower() == "price range":
             min_price = float(input("Enter minimum price: "))
             max_price = float(input("Enter maximum price: "))
-            results = [item for item in self.inventory if min_price <= item["price"] <= max_price]
+            results, total = self.find_items(min_price=min_price, max_price=max_price, limit=limit)
         else:
             self.console.print("[bold red]Invalid search option.[/bold red]")
-            self.logger.warning(f"Invalid search option: {search_by}")
+            self.logger.warning("Invalid search option: %s", search_by)
             return
 
         if results:
-            table = Table(title="Search Results")
-            table.add_column("ID", style="cyan", justify="center")
-            table.add_column("Name", style="green")
-            table.add_column("Category", style="magenta")
-            table.add_column("Quantity", justify="right")
-            table.add_column("Price", justify="right")
-
-            for item in results:
-                table.add_row(
-                    str(item["id"]),
-                    item["name"],
-                    item["category"],
-                    str(item["quantity"]),
-                    f"${item['price']:.2f}"
-                )
-
-            self.console.print(table)
-            self.logger.info(f"Searched items by {search_by} - Found {len(results)} results.")
+            ItemPager.from_items(results).browse(self.console, "Search Results")
+            if total > len(results):
+                self.console.print(f"[yellow]Showing the top {len(results)} of {total} matches.[/yellow]")
+            self.logger.info("Searched items by %s - Found %s results.", search_by, total)
         else:
             self.console.print("[bold red]No items found matching the search criteria.[/bold red]")
-            self.logger.info(f"Searched items by {search_by} - No results found.")
+            self.logger.info("Searched items by %s - No results found.", search_by)
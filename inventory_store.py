@@ -0,0 +1,385 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import accumulate, chain
+import sys
+from search_index import TrigramIndex
+from columnar import ColumnarItems
+
+class KeyIndex:
+    """Secondary index mapping a derived key to the set of matching item IDs."""
+
+    def __init__(self, key):
+        self.key = key
+        self._ids = defaultdict(set)
+
+    def add(self, item):
+        key = self.key(item)
+        if isinstance(key, str):
+            key = sys.intern(key)  # shared with the text indexes and other items
+        self._ids[key].add(item["id"])
+
+    def remove(self, item):
+        key = self.key(item)
+        ids = self._ids.get(key)
+        if ids is not None:
+            ids.discard(item["id"])
+            if not ids:
+                del self._ids[key]
+
+    def update(self, old_item, item):
+        if self.key(old_item) != self.key(item):
+            self.remove(old_item)
+            self.add(item)
+
+    def get(self, key):
+        return self._ids.get(key, set())
+
+    def keys(self):
+        return self._ids.keys()
+
+
+class SortedEntries:
+    """Sorted sequence stored as a list of sorted buckets.
+
+    Inserting into or deleting from one flat list moves every entry after
+    it; here only one bucket of at most 2 * LOAD entries moves, so both
+    are O(sqrt(n)) for the sizes we keep. Supports len(), iteration,
+    indexing and slicing, so it can be bisected like a list, plus its own
+    `bisect_left`/`bisect_right`.
+    """
+
+    LOAD = 1000
+
+    def __init__(self, entries=()):
+        self._build(sorted(entries))
+
+    def _build(self, entries):
+        self._buckets = [entries[start:start + self.LOAD] for start in range(0, len(entries), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._len = len(entries)
+        self._offsets = None
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._buckets)
+
+    def _offset(self, bucket):
+        # Position of a bucket's first entry; recomputed lazily after changes
+        if self._offsets is None:
+            self._offsets = list(accumulate((len(bucket) for bucket in self._buckets), initial=0))
+        return self._offsets[bucket]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            result = []
+            while start < stop:
+                bucket, position = self._position(start)
+                entries = self._buckets[bucket][position:position + stop - start]
+                result.extend(entries)
+                start += len(entries)
+            return result
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedEntries index out of range")
+        bucket, position = self._position(index)
+        return self._buckets[bucket][position]
+
+    def _position(self, index):
+        self._offset(0)
+        bucket = bisect_right(self._offsets, index) - 1
+        return bucket, index - self._offsets[bucket]
+
+    def bisect_left(self, value):
+        bucket = bisect_left(self._maxes, value)
+        if bucket == len(self._maxes):
+            return self._len
+        return self._offset(bucket) + bisect_left(self._buckets[bucket], value)
+
+    def bisect_right(self, value):
+        bucket = bisect_right(self._maxes, value)
+        if bucket == len(self._maxes):
+            return self._len
+        return self._offset(bucket) + bisect_right(self._buckets[bucket], value)
+
+    def add(self, value):
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+        else:
+            index = min(bisect_left(self._maxes, value), len(self._maxes) - 1)
+            bucket = self._buckets[index]
+            insort(bucket, value)
+            self._maxes[index] = bucket[-1]
+            if len(bucket) > 2 * self.LOAD:
+                self._buckets[index:index + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+                self._maxes[index:index + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+        self._len += 1
+        self._offsets = None
+
+    def extend(self, values):
+        """Add many entries with one sort (the existing run merges in linear time)."""
+        self._build(sorted(chain(self, values)))
+
+    def remove(self, value):
+        """Remove one entry equal to value, if there is one."""
+        index = bisect_left(self._maxes, value)
+        if index == len(self._maxes):
+            return
+        bucket = self._buckets[index]
+        position = bisect_left(bucket, value)
+        if position == len(bucket) or bucket[position] != value:
+            return
+        del bucket[position]
+        if bucket:
+            self._maxes[index] = bucket[-1]
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+        self._len -= 1
+        self._offsets = None
+
+
+class SortedIndex:
+    """Ordered index of (key, item ID) pairs for range queries via bisect."""
+
+    def __init__(self, key):
+        self.key = key
+        self._entries = SortedEntries()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def entries(self):
+        """The live, ordered (key, item ID) sequence; treat as read-only."""
+        return self._entries
+
+    def load(self, items):
+        """Bulk-build the index with one sort instead of n insertions."""
+        self._entries = SortedEntries((self.key(item), item["id"]) for item in items)
+
+    def add(self, item):
+        self._entries.add((self.key(item), item["id"]))
+
+    def extend(self, items):
+        """Add a batch of items with one sort."""
+        self._entries.extend((self.key(item), item["id"]) for item in items)
+
+    def remove(self, item):
+        self._entries.remove((self.key(item), item["id"]))
+
+    def update(self, old_item, item):
+        old_key, key = self.key(old_item), self.key(item)
+        if old_key != key:
+            self._entries.remove((old_key, item["id"]))
+            self._entries.add((key, item["id"]))
+
+    def below(self, upper, limit=None):
+        """Return (IDs with key < upper in ascending key order, total matches)."""
+        total = self._entries.bisect_left((upper,))
+        end = total if limit is None else min(total, limit)
+        return [item_id for _, item_id in self._entries[:end]], total
+
+    def between(self, lower, upper, limit=None):
+        """Return (IDs with lower <= key <= upper in key order, total matches)."""
+        start = self._entries.bisect_left((lower,))
+        end = self._entries.bisect_right((upper, float("inf")))
+        total = max(end - start, 0)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [item_id for _, item_id in self._entries[start:end]], total
+
+
+class ReorderTracker:
+    """Tracks items that dropped to or below their own `reorder_point`.
+
+    Items without a reorder point are ignored. Crossings accumulate until
+    `take_crossed` is called, so each one is reported once.
+    """
+
+    def __init__(self):
+        self._crossed = set()
+
+    @staticmethod
+    def _is_below(item):
+        reorder_point = item.get("reorder_point")
+        return reorder_point is not None and item["quantity"] <= reorder_point
+
+    def add(self, item):
+        if self._is_below(item):
+            self._crossed.add(item["id"])
+
+    def update(self, old_item, item):
+        if self._is_below(item):
+            if not self._is_below(old_item):
+                self._crossed.add(item["id"])
+        else:
+            self._crossed.discard(item["id"])
+
+    def remove(self, item):
+        self._crossed.discard(item["id"])
+
+    def take_crossed(self):
+        """Return the IDs that crossed since the last call and reset the tracker."""
+        crossed, self._crossed = self._crossed, set()
+        return sorted(crossed)
+
+
+class InventoryStore:
+    """In-memory inventory keyed by item ID.
+
+    Every index registered with the store is kept consistent across
+    add/update/remove. On update an index sees `update(old_item, item)`
+    if it defines one, otherwise `remove(old_item)` followed by `add(item)`.
+
+    With `compact=True` items are kept in typed columns (see ColumnarItems)
+    and handed out as dict-like row views instead of separate dicts. A
+    ColumnarItems table passed as `items` is adopted as is.
+    """
+
+    def __init__(self, items=(), compact=False):
+        if isinstance(items, ColumnarItems):
+            self._items, items = items, ()
+        else:
+            self._items = ColumnarItems() if compact else {}
+        self.indexes = {
+            "category": KeyIndex(lambda item: item["category"]),
+            "name": KeyIndex(lambda item: item["name"].lower()),
+            "id": SortedIndex(lambda item: item["id"]),
+            "quantity": SortedIndex(lambda item: item["quantity"]),
+            "price": SortedIndex(lambda item: item["price"]),
+            "value": SortedIndex(lambda item: item["quantity"] * item["price"]),
+            "name_text": TrigramIndex(lambda item: item["name"]),
+            "category_text": TrigramIndex(lambda item: item["category"]),
+            "reorder": ReorderTracker(),
+        }
+        for item in items:
+            if item["id"] in self._items:
+                raise ValueError(f"Item with ID {item['id']} already exists.")
+            self._items[item["id"]] = item
+        for index in self.indexes.values():
+            self._populate(index)
+
+    @property
+    def compact(self):
+        return isinstance(self._items, ColumnarItems)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def items(self):
+        """Live view of all items, in insertion (ID) order."""
+        return self._items.values()
+
+    def get(self, item_id):
+        return self._items.get(item_id)
+
+    def max_id(self):
+        return max(self._items.keys(), default=0)
+
+    def add_index(self, name, index):
+        """Register an index and populate it from the current items."""
+        self._populate(index)
+        self.indexes[name] = index
+
+    def _populate(self, index):
+        if hasattr(index, "load"):
+            index.load(self._items.values())
+        else:
+            for item in self._items.values():
+                index.add(item)
+
+    def add(self, item):
+        if item["id"] in self._items:
+            raise ValueError(f"Item with ID {item['id']} already exists.")
+        self._items[item["id"]] = item
+        item = self._items[item["id"]]
+        for index in self.indexes.values():
+            index.add(item)
+        return item
+
+    def add_many(self, items):
+        """Add a batch of items, extending each index once rather than per item."""
+        ids = [item["id"] for item in items]
+        for item_id in ids:
+            if item_id in self._items:
+                raise ValueError(f"Item with ID {item_id} already exists.")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate item IDs in batch.")
+        for item in items:
+            self._items[item["id"]] = item
+        added = [self._items[item_id] for item_id in ids]
+        for index in self.indexes.values():
+            if hasattr(index, "extend"):
+                index.extend(added)
+            else:
+                for item in added:
+                    index.add(item)
+        return added
+
+    def update(self, item_id, changes):
+        """Apply field changes to an item in place and reindex it."""
+        item = self._items[item_id]
+        old_item = dict(item)
+        item.update(changes)
+        for index in self.indexes.values():
+            if hasattr(index, "update"):
+                index.update(old_item, item)
+            else:
+                index.remove(old_item)
+                index.add(item)
+        return item
+
+    def remove(self, item_id):
+        item = self._items.pop(item_id)
+        for index in self.indexes.values():
+            index.remove(item)
+        return item
+
+    def sorted_entries(self, sort_by):
+        """Ordered (key, item ID) entries for one of "id", "quantity", "price" or "value"."""
+        return self.indexes[sort_by].entries
+
+    def find_by_category(self, category):
+        return [self._items[item_id] for item_id in sorted(self.indexes["category"].get(category))]
+
+    def find_by_name(self, name):
+        return [self._items[item_id] for item_id in sorted(self.indexes["name"].get(name.lower()))]
+
+    def find_quantity_below(self, threshold, limit=None):
+        """Return (items with quantity < threshold, lowest stock first, total matches)."""
+        item_ids, total = self.indexes["quantity"].below(threshold, limit)
+        return [self._items[item_id] for item_id in item_ids], total
+
+    def take_reorder_crossings(self):
+        """Items that crossed their reorder point since the last call."""
+        return [self._items[item_id] for item_id in self.indexes["reorder"].take_crossed()]
+
+    def search_name(self, text, limit=None):
+        """Return (ranked items whose name contains text, total matches)."""
+        return self._text_search("name_text", text, limit)
+
+    def search_category(self, text, limit=None):
+        """Return (ranked items whose category contains text, total matches)."""
+        return self._text_search("category_text", text, limit)
+
+    def find_price_between(self, lower, upper, limit=None):
+        """Return (items priced within [lower, upper], cheapest first, total matches)."""
+        item_ids, total = self.indexes["price"].between(lower, upper, limit)
+        return [self._items[item_id] for item_id in item_ids], total
+
+    def _text_search(self, index_name, text, limit):
+        item_ids, total = self.indexes[index_name].search(text, limit)
+        return [self._items[item_id] for item_id in item_ids], total
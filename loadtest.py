@@ -0,0 +1,102 @@
+"""Load-test client for server.py.
+
+Usage:
+    python loadtest.py [--url http://127.0.0.1:8080] [--connections 50]
+                       [--requests 10000] [--write-ratio 0.1]
+
+Opens keep-alive connections concurrently and sends a mix of stock lookups
+(GET /items/<id>), searches and quantity updates (PATCH /items/<id>), then
+reports throughput and latency percentiles.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+
+async def send(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+        f"Content-Type: application/json\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+
+async def worker(host, port, item_ids, requests, write_ratio, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            item_id = random.choice(item_ids)
+            roll = random.random()
+            started = time.perf_counter()
+            if roll < write_ratio:
+                status, _ = await send(reader, writer, "PATCH", f"/items/{item_id}",
+                                       {"quantity": random.randint(0, 500)})
+            elif roll < write_ratio + 0.1:
+                status, _ = await send(reader, writer, "GET", "/items?name=a&limit=20")
+            else:
+                status, _ = await send(reader, writer, "GET", f"/items/{item_id}")
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(url, connections, requests, write_ratio):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    reader, writer = await asyncio.open_connection(host, port)
+    _, result = await send(reader, writer, "GET", "/items?min_price=0&limit=1000")
+    writer.close()
+    item_ids = [item["id"] for item in result["items"]]
+    if not item_ids:
+        print("The inventory is empty; import some items first (see bulk.py).")
+        return
+
+    latencies, errors = [], []
+    per_connection = max(1, requests // connections)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, item_ids, per_connection, write_ratio, latencies, errors)
+        for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {connections} connections in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:.0f} req/s), {len(errors)} errors")
+    print(f"latency ms: p50={percentile(latencies, 0.5) * 1000:.2f} "
+          f"p95={percentile(latencies, 0.95) * 1000:.2f} p99={percentile(latencies, 0.99) * 1000:.2f} "
+          f"max={latencies[-1] * 1000:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the inventory HTTP service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.url, args.connections, args.requests, args.write_ratio))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Non-blocking logging setup shared by the entry points.
+
+configure_logging() attaches a queue handler to the root logger and starts
+a QueueListener thread that does the formatting and file I/O, so a log call
+on a hot path only creates a record and puts it on a queue.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import config
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats every record before queueing it (so it
+    can be pickled). Records here stay in-process, so that work is moved
+    off the caller; log arguments must therefore not be mutated after the
+    call (pass IDs and plain values, not live item objects).
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(path=None, level=logging.INFO):
+    """Send log records through a background thread to the application log file.
+
+    Safe to call more than once; the listener is stopped (and the queue
+    flushed) at interpreter exit.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    path = path or os.path.join(config.DATA_DIR, "inventory_app.log")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(DeferredQueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
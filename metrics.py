@@ -0,0 +1,139 @@
+"""Lightweight in-process instrumentation.
+
+Latencies are recorded into fixed-bucket histograms (one per operation name)
+and sizes into counters, all under one lock so recording costs a few dict
+operations. The module-level REGISTRY is what the application records to;
+`timed` and `count` are shortcuts for it.
+
+    with timed("datastore.load"):
+        ...
+    count("datastore.bytes_read", size)
+
+REGISTRY.to_prometheus() renders everything in the Prometheus text format.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import re
+import threading
+import time
+
+# Upper bounds in seconds; a final +Inf bucket catches everything slower
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observations per latency bucket plus their count, sum and maximum."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Estimate a percentile by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count, histogram.sum, histogram.max = self.count, self.sum, self.max
+        return histogram
+
+
+class MetricsRegistry:
+    """Thread-safe collection of named latency histograms and counters."""
+
+    def __init__(self, prefix="inventory"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    @contextmanager
+    def timed(self, name):
+        """Record the duration of the block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        """Return consistent copies: ({name: Histogram}, {name: value})."""
+        with self._lock:
+            return {name: histogram.copy() for name, histogram in self._histograms.items()}, dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        histograms, counters = self.snapshot()
+        latency = f"{self.prefix}_operation_duration_seconds"
+        lines = [f"# HELP {latency} Latency of instrumented operations.", f"# TYPE {latency} histogram"]
+        for name, histogram in sorted(histograms.items()):
+            label = f'operation="{_escape_label(name)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{latency}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{latency}_sum{{{label}}} {histogram.sum!r}")
+            lines.append(f"{latency}_count{{{label}}} {histogram.count}")
+        for name, value in sorted(counters.items()):
+            metric = f"{self.prefix}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(name):
+    return REGISTRY.timed(name)
+
+
+def count(name, amount=1):
+    REGISTRY.count(name, amount)
@@ -0,0 +1,141 @@
+from bisect import bisect_left, bisect_right
+from rich.prompt import Prompt
+from rich.table import Table
+
+PAGE_SIZE = 20
+
+
+def build_item_table(title, items, extra_columns=(), caption=None):
+    """Build the standard item table; extra_columns are (header, value_fn) pairs."""
+    table = Table(title=title, caption=caption)
+    table.add_column("ID", style="cyan", justify="center")
+    table.add_column("Name", style="green")
+    table.add_column("Category", style="magenta")
+    table.add_column("Quantity", justify="right")
+    table.add_column("Price", justify="right")
+    for header, _ in extra_columns:
+        table.add_column(header, justify="right")
+
+    for item in items:
+        table.add_row(
+            str(item["id"]),
+            item["name"],
+            item["category"],
+            str(item["quantity"]),
+            f"${item['price']:.2f}",
+            *(value(item) for _, value in extra_columns)
+        )
+    return table
+
+
+class ItemPager:
+    """Keyset pagination over an ordered list of (sort key, item ID) entries.
+
+    `entries` is usually the live entry sequence of a SortedIndex, so only the
+    current page is ever materialized. Next/previous pages are found by
+    bisecting from the first/last entry shown, which stays correct when
+    items are added or removed between pages. `upper` optionally bounds the
+    view to keys below it (e.g. a low-stock threshold).
+    """
+
+    def __init__(self, entries, lookup, page_size=PAGE_SIZE, upper=None):
+        self.entries = entries
+        self.lookup = lookup
+        self.page_size = page_size
+        self.upper = upper
+        self._first = None
+        self._last = None
+
+    @classmethod
+    def from_items(cls, items, page_size=PAGE_SIZE):
+        """Page over an already ordered list of items, such as search results."""
+        by_id = {item["id"]: item for item in items}
+        entries = [(position, item["id"]) for position, item in enumerate(items)]
+        return cls(entries, by_id.get, page_size)
+
+    def _end(self):
+        if self.upper is None:
+            return len(self.entries)
+        return bisect_left(self.entries, (self.upper,))
+
+    def total(self):
+        return self._end()
+
+    def page_count(self):
+        return max(1, -(-self.total() // self.page_size))
+
+    def page_number(self):
+        """1-based number of the current page."""
+        if self._first is None:
+            return 1
+        return bisect_left(self.entries, self._first) // self.page_size + 1
+
+    def _page(self, start, end):
+        page = self.entries[start:end]
+        if page:
+            self._first, self._last = page[0], page[-1]
+        return [self.lookup(item_id) for _, item_id in page]
+
+    def first_page(self):
+        return self.jump(1)
+
+    def jump(self, page_number):
+        page_number = min(max(page_number, 1), self.page_count())
+        start = (page_number - 1) * self.page_size
+        return self._page(start, min(start + self.page_size, self._end()))
+
+    def next_page(self):
+        if self._last is None:
+            return self.first_page()
+        start = bisect_right(self.entries, self._last)
+        end = min(start + self.page_size, self._end())
+        if start >= end:
+            return None
+        return self._page(start, end)
+
+    def prev_page(self):
+        if self._first is None:
+            return self.first_page()
+        end = bisect_left(self.entries, self._first)
+        if end <= 0:
+            return None
+        return self._page(max(0, end - self.page_size), end)
+
+    def browse(self, console, title, extra_columns=(), sort_options=None):
+        """Interactively page through the entries.
+
+        sort_options maps a sort name to a function returning a new pager;
+        when given, an extra "(s)ort" command switches between them. When
+        the console is not interactive (output redirected to a file), only
+        the first page is printed.
+        """
+        pager = self
+        base_title = title
+        items = pager.first_page()
+        commands = ["n", "p", "j", "q"] + (["s"] if sort_options else [])
+        while True:
+            caption = f"Page {pager.page_number()} of {pager.page_count()} ({pager.total()} items)"
+            console.print(build_item_table(title, items, extra_columns, caption=caption))
+            if (pager.page_count() == 1 and not sort_options) or not console.is_interactive:
+                return
+
+            command = Prompt.ask(
+                "(n)ext, (p)rev, (j)ump" + (", (s)ort" if sort_options else "") + ", (q)uit",
+                choices=commands, default="q", show_choices=False,
+            ).lower()
+            if command == "q":
+                return
+            if command == "n":
+                items = pager.next_page() or items
+            elif command == "p":
+                items = pager.prev_page() or items
+            elif command == "j":
+                try:
+                    items = pager.jump(int(Prompt.ask(f"Page (1-{pager.page_count()})")))
+                except ValueError:
+                    console.print("[bold red]Page must be an integer.[/bold red]")
+            elif command == "s":
+                sort_by = Prompt.ask("Sort by", choices=list(sort_options), default=next(iter(sort_options)))
+                pager = sort_options[sort_by]()
+                items = pager.first_page()
+                title = f"{base_title} (sorted by {sort_by})"
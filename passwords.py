@@ -0,0 +1,145 @@
+"""Password hashing with a deliberately slow, salted key derivation function.
+
+Hashes are stored as self-describing strings, so the algorithm or its cost
+can change without invalidating existing passwords:
+
+    scrypt$<log2 N>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+(salt and hash in unpadded URL-safe base64). Plain 64-character hex strings
+are legacy single-round SHA-256 hashes; they still verify, and
+`needs_rehash` reports them (and hashes made with other settings) so they
+can be replaced after a successful login.
+
+Each hash takes tens of milliseconds on purpose. hashlib releases the GIL
+while deriving keys, so PasswordHasher runs them on a bounded thread pool
+that keeps other threads responsive and lets logins proceed in parallel.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import os
+import threading
+import config
+
+DEFAULT_COST = {"scrypt": 14, "pbkdf2": 600_000}
+# Accepted costs per method: scrypt's is log2 N (20 already needs 1 GiB per
+# hash), PBKDF2's an iteration count
+COST_RANGE = {"scrypt": (10, 20), "pbkdf2": (100_000, 100_000_000)}
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+PENDING_PER_WORKER = 8
+
+
+def _b64encode(data):
+    return urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password, salt, log_n, r, p):
+    n = 1 << log_n
+    # scrypt needs 128 * r * N bytes; leave headroom over OpenSSL's 32 MiB default
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * r * n, dklen=KEY_BYTES)
+
+
+def _default_method():
+    if config.PASSWORD_HASH == "scrypt" and not hasattr(hashlib, "scrypt"):
+        return "pbkdf2"  # Python built against an OpenSSL without scrypt
+    return config.PASSWORD_HASH
+
+
+def password_cost(method, cost=None):
+    """The cost to hash with: `cost`, else the configured one for method, else its default.
+
+    Raises ValueError for an unknown method or a cost outside COST_RANGE,
+    such as an iteration count given as a scrypt cost.
+    """
+    if method not in DEFAULT_COST:
+        raise ValueError(f"Unknown password hash: {method}")
+    configured = config.SCRYPT_COST if method == "scrypt" else config.PBKDF2_ITERATIONS
+    cost = cost or configured or DEFAULT_COST[method]
+    low, high = COST_RANGE[method]
+    if not low <= cost <= high:
+        raise ValueError(f"{method} cost must be between {low} and {high}, got {cost}.")
+    return cost
+
+
+def hash_password(password, method=None, cost=None):
+    """Hash a password with a fresh random salt; defaults come from config."""
+    method = method or _default_method()
+    cost = password_cost(method, cost)
+    salt = os.urandom(SALT_BYTES)
+    if method == "scrypt":
+        key = _scrypt(password.encode(), salt, cost, SCRYPT_BLOCK_SIZE, SCRYPT_PARALLELISM)
+        return f"scrypt${cost}${SCRYPT_BLOCK_SIZE}${SCRYPT_PARALLELISM}${_b64encode(salt)}${_b64encode(key)}"
+    key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, cost, KEY_BYTES)
+    return f"pbkdf2_sha256${cost}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password, stored):
+    """Check a password against a stored hash of any supported kind."""
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        log_n, r, p = (int(part) for part in parts[1:4])
+        key = _scrypt(password.encode(), _b64decode(parts[4]), log_n, r, p)
+        return hmac.compare_digest(key, _b64decode(parts[5]))
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), _b64decode(parts[2]), int(parts[1]), KEY_BYTES)
+        return hmac.compare_digest(key, _b64decode(parts[3]))
+    if len(stored) == 64:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy.encode(), stored.encode())
+    raise ValueError("Unrecognized password hash format.")
+
+
+def needs_rehash(stored):
+    """Whether a stored hash differs from what hash_password would produce now."""
+    method = _default_method()
+    cost = password_cost(method)
+    parts = stored.split("$")
+    if method == "scrypt":
+        return parts[:4] != ["scrypt", str(cost), str(SCRYPT_BLOCK_SIZE), str(SCRYPT_PARALLELISM)]
+    return parts[:2] != ["pbkdf2_sha256", str(cost)]
+
+
+class PasswordHasher:
+    """Runs hash_password/verify_password on a bounded pool of worker threads.
+
+    At most `workers` hashes run at once and at most
+    `workers * PENDING_PER_WORKER` wait; further submissions block, so a
+    burst of logins queues up instead of piling unbounded work (and memory,
+    with scrypt) onto the process.
+    """
+
+    def __init__(self, workers=None):
+        password_cost(_default_method())  # Reject a bad configuration up front
+        self.workers = workers or config.HASH_WORKERS or min(4, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+        self._slots = threading.BoundedSemaphore(self.workers * (PENDING_PER_WORKER + 1))
+
+    def _submit(self, function, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        """Future of hash_password(password)."""
+        return self._submit(hash_password, password)
+
+    def verify(self, password, stored):
+        """Future of verify_password(password, stored)."""
+        return self._submit(verify_password, password, stored)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
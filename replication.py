@@ -0,0 +1,588 @@
+"""Delta replication of the inventory to read-only replicas.
+
+A primary wraps its inventory backend in a PublishingStore. Every batch
+of changes it persists is also published as a delta with the next
+sequence number. A DirectoryTransport stores each delta as one file and
+keeps a snapshot of the whole inventory at some sequence number:
+
+    <dir>/head.json                 {"seq", "snapshot_seq", "source_version"}
+    <dir>/snapshot.jsonl            header line, one item per line, checksum line
+    <dir>/deltas/<seq>.json         {"seq", "records", "source_version", "checksum"}
+
+Once `snapshot_every` deltas have accumulated, they are folded into a new
+snapshot in the background. The last `retain` deltas before it are kept,
+so a replica that is only a little behind can still resume.
+
+A replica is an InventoryAPI (or InventoryManager) on a ReplicaStore. The
+ReplicaStore reads the snapshot, then applies deltas in sequence order and
+checks each checksum. It reports deltas through `poll_changes`, so
+`refresh()` applies only what is new. A replica resumes from its sequence
+number. It resyncs from the snapshot when the deltas it needs were pruned
+or when the chain breaks. A delta whose checksum fails is not applied: the
+replica stays just before it until a snapshot at or past that sequence
+number is published, then resyncs from it. Compaction verifies every delta
+the same way and is abandoned at a corrupt one. With a cache path, a
+replica keeps its copy on disk and resumes from there after a restart.
+
+Replicas read the directory directly, or over TCP from a server run on
+the primary's machine:
+
+    python replication.py serve --directory data/replication [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+from hashlib import sha256
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from filelock import FileLock
+from storage import ReadOnlyError, StorageBackend
+
+DELTA_PAGE_SIZE = 500
+
+
+class ReplicationError(Exception):
+    """Raised when replicated data is corrupt or the source cannot be followed."""
+
+
+def _canonical(data):
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+def delta_checksum(delta):
+    """Checksum of a delta's contents (everything but the checksum itself)."""
+    return sha256(_canonical({key: value for key, value in delta.items() if key != "checksum"}).encode()).hexdigest()
+
+
+def read_snapshot_lines(lines):
+    """Parse and verify snapshot lines; returns (header, items)."""
+    digest = sha256()
+    lines = iter(lines)
+    header_line = next(lines, None)
+    if header_line is None:
+        raise ReplicationError("Empty snapshot.")
+    digest.update(header_line.encode())
+    header = json.loads(header_line)
+    items = []
+    for _ in range(header["count"]):
+        line = next(lines, None)
+        if line is None:
+            raise ReplicationError("Snapshot is truncated.")
+        digest.update(line.encode())
+        items.append(json.loads(line))
+    trailer = next(lines, None)
+    if trailer is None or json.loads(trailer).get("checksum") != digest.hexdigest():
+        raise ReplicationError(f"Checksum mismatch in snapshot {header.get('seq')}.")
+    return header, items
+
+
+class DirectoryTransport:
+    """Deltas and snapshots kept in a directory (see the module docstring).
+
+    The primary publishes through it; replicas on the same machine (or a
+    shared mount) read it directly. Publishing holds `<dir>/.lock`, so
+    sequence numbers stay gap-free even with several writers.
+    """
+
+    def __init__(self, directory, snapshot_every=1000, retain=1000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.retain = retain
+        self.delta_dir = os.path.join(directory, "deltas")
+        self.head_path = os.path.join(directory, "head.json")
+        self.snapshot_path = os.path.join(directory, "snapshot.jsonl")
+        self.file_lock = FileLock(os.path.join(directory, ".lock"))
+        self.logger = logging.getLogger(__name__)
+        self._compaction_thread = None
+        os.makedirs(self.delta_dir, exist_ok=True)
+
+    def _delta_path(self, seq):
+        return os.path.join(self.delta_dir, f"{seq:012d}.json")
+
+    def _write_json(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(_canonical(data))
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def head(self):
+        return self._read_json(self.head_path) or {"seq": 0, "snapshot_seq": 0, "source_version": None}
+
+    def publish(self, records, source_version):
+        """Publish one batch of change records as the next delta; returns its sequence number."""
+        with self.file_lock:
+            head = self.head()
+            delta = {"seq": head["seq"] + 1, "records": records, "source_version": source_version}
+            delta["checksum"] = delta_checksum(delta)
+            self._write_json(self._delta_path(delta["seq"]), delta)
+            self._write_json(self.head_path, dict(head, seq=delta["seq"], source_version=source_version))
+            if delta["seq"] - head["snapshot_seq"] >= self.snapshot_every:
+                self.compact()
+        return delta["seq"]
+
+    def publish_snapshot(self, items, source_version):
+        """Publish the items (any iterable) as a new snapshot; replicas behind it resync."""
+        # A compaction finishing later sees the new snapshot and gives up
+        with self.file_lock:
+            head = self.head()
+            seq = head["seq"] + 1
+            self._write_snapshot(items, seq, source_version)
+            self._write_json(self.head_path, {"seq": seq, "snapshot_seq": seq, "source_version": source_version})
+            self._prune(seq)
+        self.logger.info("Published inventory snapshot at sequence %s", seq)
+        return seq
+
+    def _write_snapshot(self, items, seq, source_version):
+        lines = [_canonical(item) + "\n" for item in items]
+        header = _canonical({"seq": seq, "source_version": source_version, "count": len(lines)}) + "\n"
+        digest = sha256(header.encode())
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(header)
+            for line in lines:
+                digest.update(line.encode())
+                file.write(line)
+            file.write(_canonical({"checksum": digest.hexdigest()}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _prune(self, up_to):
+        for name in os.listdir(self.delta_dir):
+            if name.endswith(".json") and int(name[:-5]) <= up_to:
+                os.remove(os.path.join(self.delta_dir, name))
+
+    def compact(self, wait=False):
+        """Fold published deltas into a new snapshot on a background thread."""
+        with self.file_lock:
+            running = self._compaction_thread and self._compaction_thread.is_alive()
+            if not running:
+                self._compaction_thread = threading.Thread(
+                    target=self._compact, name="replication-compaction", daemon=True
+                )
+                self._compaction_thread.start()
+        if wait:
+            self.wait_for_compaction()
+
+    def wait_for_compaction(self):
+        thread = self._compaction_thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join()
+
+    def _compact(self):
+        # Deltas and the snapshot are immutable once written, so they are
+        # read without the lock; the new snapshot is installed only if no
+        # other snapshot was published meanwhile.
+        try:
+            head = self.head()
+            header, items = self.read_snapshot() if head["snapshot_seq"] else ({"seq": 0}, [])
+            if header["seq"] != head["snapshot_seq"]:
+                return
+            items = {item["id"]: item for item in items}
+            for delta in self.read_since(head["snapshot_seq"], limit=head["seq"] - head["snapshot_seq"]) or ():
+                if delta.get("checksum") != delta_checksum(delta):
+                    raise ReplicationError(f"Checksum mismatch in delta {delta.get('seq')}; not compacting past it.")
+                apply_records(items, delta["records"])
+            with self.file_lock:
+                current = self.head()
+                if current["snapshot_seq"] != head["snapshot_seq"]:
+                    return
+                self._write_snapshot(items.values(), head["seq"], head["source_version"])
+                self._write_json(self.head_path, dict(current, snapshot_seq=head["seq"]))
+                self._prune(head["seq"] - self.retain)
+            self.logger.info("Compacted replication deltas into a snapshot at sequence %s", head["seq"])
+        except Exception as e:
+            self.logger.error("Error compacting replication deltas: %s", e)
+
+    def read_since(self, seq, limit=DELTA_PAGE_SIZE):
+        """Up to `limit` deltas after `seq`, oldest first; None if they are no longer all available."""
+        deltas = []
+        while len(deltas) < limit:
+            delta = self._read_json(self._delta_path(seq + len(deltas) + 1))
+            if delta is None:
+                break
+            deltas.append(delta)
+        if not deltas:
+            head = self.head()
+            # Pruned into a newer snapshot, or the transport was reset
+            if head["snapshot_seq"] > seq or head["seq"] < seq:
+                return None
+        return deltas
+
+    def read_snapshot(self):
+        """The current snapshot as (header, items); ReplicationError if it is missing or corrupt."""
+        try:
+            with open(self.snapshot_path, "r") as file:
+                return read_snapshot_lines(file)
+        except FileNotFoundError:
+            raise ReplicationError(f"No snapshot published in {self.directory} yet.")
+
+    def close(self):
+        self.wait_for_compaction()
+        self.file_lock.close()
+
+
+class _TransportHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line; see SocketTransport for the replies.
+    def handle(self):
+        transport = self.server.transport
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request["op"] == "head":
+                    reply = [_canonical(transport.head())]
+                elif request["op"] == "since":
+                    deltas = transport.read_since(request["seq"], min(request.get("limit", DELTA_PAGE_SIZE), DELTA_PAGE_SIZE))
+                    reply = [_canonical({"resync": True} if deltas is None else {"deltas": deltas})]
+                elif request["op"] == "snapshot":
+                    with open(transport.snapshot_path, "r") as file:
+                        reply = [line.rstrip("\n") for line in file]
+                else:
+                    reply = [_canonical({"error": f"Unknown request: {request['op']}"})]
+            except (ValueError, KeyError, OSError) as e:
+                reply = [_canonical({"error": str(e)})]
+            self.wfile.write("".join(part + "\n" for part in reply).encode())
+            self.wfile.flush()
+
+
+class ReplicationServer(socketserver.ThreadingTCPServer):
+    """Serves a DirectoryTransport to SocketTransport clients."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, transport, address):
+        self.transport = transport
+        super().__init__(address, _TransportHandler)
+
+
+class SocketTransport:
+    """Reads deltas and snapshots from a ReplicationServer; reconnects on errors."""
+
+    def __init__(self, host, port, timeout=30):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def _exchange(self, request, read_reply):
+        """Send one request and read its reply with read_reply(readline)."""
+        with self._lock:
+            if self._socket is None:
+                self._socket = socket.create_connection(self.address, timeout=self.timeout)
+                self._file = self._socket.makefile("r", encoding="utf-8")
+            try:
+                self._socket.sendall((_canonical(request) + "\n").encode())
+                return read_reply(self._readline)
+            except (OSError, ValueError):
+                # Drop the connection; a half-read reply would desynchronize it
+                self._close()
+                raise
+
+    def _readline(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Replication server closed the connection.")
+        return line
+
+    @staticmethod
+    def _checked(line):
+        reply = json.loads(line)
+        if "error" in reply:
+            raise ReplicationError(reply["error"])
+        return reply
+
+    def head(self):
+        return self._exchange({"op": "head"}, lambda readline: self._checked(readline()))
+
+    def read_since(self, seq, limit=DELTA_PAGE_SIZE):
+        reply = self._exchange({"op": "since", "seq": seq, "limit": limit}, lambda readline: self._checked(readline()))
+        return None if reply.get("resync") else reply["deltas"]
+
+    def read_snapshot(self):
+        def read_reply(readline):
+            first = readline()
+            header = self._checked(first)
+            return [first] + [readline() for _ in range(header["count"] + 1)]
+
+        return read_snapshot_lines(self._exchange({"op": "snapshot"}, read_reply))
+
+    def _close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+def open_transport(source):
+    """A transport for a replica source: a directory, or "host:port" of a ReplicationServer."""
+    host, _, port = source.rpartition(":")
+    if host and port.isdigit() and not os.path.isdir(source):
+        return SocketTransport(host, int(port))
+    return DirectoryTransport(source)
+
+
+def apply_records(items, records):
+    """Apply change records to an {id: item} mapping in place."""
+    for record in records:
+        if record["op"] == "delete":
+            items.pop(record["id"], None)
+        else:
+            items[record["item"]["id"]] = record["item"]
+
+
+def _as_records(changes):
+    return [
+        {"op": op, "id": item["id"]} if op == "delete" else {"op": op, "item": dict(item)}
+        for op, item in changes
+    ]
+
+
+class PublishingStore(StorageBackend):
+    """Primary-side wrapper that publishes every persisted change to a transport.
+
+    Each batch is published while the backend's lock is held, so deltas
+    are in the same order as the backend's own log even with several
+    primary processes. On load, a snapshot is published if the transport
+    does not already reflect the backend's version (first start, or
+    changes made while publishing was off). Other attributes, e.g.
+    `shard_of`, are those of the wrapped backend.
+    """
+
+    def __init__(self, backend, transport):
+        self.backend = backend
+        self.transport = transport
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    @property
+    def version(self):
+        return self.backend.version
+
+    def lock(self):
+        return self.backend.lock()
+
+    def poll_changes(self):
+        return self.backend.poll_changes()
+
+    def _transport_is_current(self):
+        return self.transport.head()["source_version"] == self.backend.version
+
+    def load_data(self):
+        with self.backend.lock():
+            data = self.backend.load_data()
+            if not self._transport_is_current():
+                self.transport.publish_snapshot(data, self.backend.version)
+        return data
+
+    def iter_items(self):
+        with self.backend.lock():
+            yield from self.backend.iter_items()
+            if not self._transport_is_current():
+                self.transport.publish_snapshot(self.backend.iter_items(), self.backend.version)
+
+    def load_columns(self):
+        """The backend's columnar load (None if it has none), publishing a snapshot like load_data."""
+        load_columns = getattr(self.backend, "load_columns", None)
+        if load_columns is None:
+            return None
+        with self.backend.lock():
+            items = load_columns()
+            if items is not None and not self._transport_is_current():
+                self.transport.publish_snapshot((dict(item) for item in items.values()), self.backend.version)
+        return items
+
+    def save_data(self, data):
+        # Not under the lock: the backend's compaction needs it to finish
+        self.backend.wait_for_compaction()
+        with self.backend.lock():
+            self.backend.save_data(data)
+            self.transport.publish_snapshot(data, self.backend.version)
+
+    def append_changes(self, changes):
+        if not changes:
+            return
+        with self.backend.lock():
+            self.backend.append_changes(changes)
+            self.transport.publish(_as_records(changes), self.backend.version)
+
+    def compact(self, wait=False):
+        self.backend.compact(wait=wait)
+
+    def wait_for_compaction(self):
+        self.backend.wait_for_compaction()
+        self.transport.wait_for_compaction()
+
+    def close(self):
+        self.backend.close()
+        self.transport.close()
+
+
+class ReplicaStore(StorageBackend):
+    """Read-only inventory backend that follows a primary through a transport.
+
+    `version` is the sequence number of the last applied delta. With
+    `cache_path`, the replicated inventory is also kept in a local
+    DataStore so a restarted replica resumes from its sequence number
+    instead of downloading the snapshot again.
+    """
+
+    read_only = True
+
+    def __init__(self, transport, cache_path=None):
+        self.transport = transport
+        self.version = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._bad_seq = None
+        self.cache = None
+        self.cache_seq_path = None
+        if cache_path is not None:
+            from datastore import DataStore
+            self.cache = DataStore(cache_path)
+            self.cache_seq_path = f"{os.path.splitext(cache_path)[0]}.replica.json"
+
+    def _fetch(self):
+        """Verified deltas after `version`, or None if a resync is needed.
+
+        Stops before a delta whose checksum does not match and remembers
+        its sequence number; once the published snapshot covers it, a
+        resync is requested instead.
+        """
+        if self._bad_seq is not None and self.transport.head()["snapshot_seq"] >= self._bad_seq:
+            self.logger.info("Resyncing replica past corrupt delta %s", self._bad_seq)
+            return None
+        deltas = []
+        seq = self.version
+        while True:
+            page = self.transport.read_since(seq)
+            if page is None:
+                return None
+            for delta in page:
+                if delta.get("seq") != seq + 1:
+                    self.logger.error("Resyncing replica: expected delta %s, got %s", seq + 1, delta.get("seq"))
+                    return None
+                if delta.get("checksum") != delta_checksum(delta):
+                    if self._bad_seq != seq + 1:
+                        self.logger.error("Checksum mismatch in replication delta %s; waiting for a newer snapshot", seq + 1)
+                        self._bad_seq = seq + 1
+                    return deltas
+                seq += 1
+                deltas.append(delta)
+            if len(page) < DELTA_PAGE_SIZE:
+                return deltas
+
+    def _advance(self, deltas):
+        records = [record for delta in deltas for record in delta["records"]]
+        if deltas:
+            self.version = deltas[-1]["seq"]
+            if self.cache is not None:
+                self.cache.append_changes([
+                    ("delete", {"id": record["id"]}) if record["op"] == "delete" else (record["op"], record["item"])
+                    for record in records
+                ])
+                self._write_cache_seq()
+        return records
+
+    def _resync(self):
+        header, items = self.transport.read_snapshot()
+        self.version = header["seq"]
+        if self._bad_seq is not None and header["seq"] >= self._bad_seq:
+            self._bad_seq = None
+        self.logger.info("Replica loaded snapshot at sequence %s (%s items)", header["seq"], len(items))
+        if self.cache is not None:
+            self.cache.save_data(items)
+            self._write_cache_seq()
+        return items
+
+    def _read_cache_seq(self):
+        try:
+            with open(self.cache_seq_path, "r") as file:
+                return json.load(file)["seq"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_cache_seq(self):
+        tmp_path = f"{self.cache_seq_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"seq": self.version}, file)
+        os.replace(tmp_path, self.cache_seq_path)
+
+    def load_data(self):
+        """The replicated inventory, caught up with the primary."""
+        with self._lock:
+            seq = self._read_cache_seq() if self.cache is not None else None
+            if seq is not None:
+                items = {item["id"]: item for item in self.cache.load_data()}
+                self.version = seq
+                deltas = self._fetch()
+                if deltas is not None:
+                    apply_records(items, self._advance(deltas))
+                    self.logger.info("Replica resumed at sequence %s (%s delta(s) applied)", self.version, len(deltas))
+                    return list(items.values())
+            items = {item["id"]: item for item in self._resync()}
+            # Deltas published while the snapshot was being read
+            apply_records(items, self._advance(self._fetch() or []))
+            return list(items.values())
+
+    def poll_changes(self):
+        """Change records of the deltas published since the last load or poll; None to resync."""
+        with self._lock:
+            try:
+                deltas = self._fetch()
+            except (OSError, ReplicationError) as e:
+                # The primary may be briefly unreachable; serve what we have
+                self.logger.warning("Could not poll replication source: %s", e)
+                return []
+            if deltas is None:
+                return None
+            return self._advance(deltas)
+
+    def save_data(self, data):
+        raise ReadOnlyError()
+
+    def append_changes(self, changes):
+        raise ReadOnlyError()
+
+    def close(self):
+        self.transport.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a replication directory to replicas over TCP.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    serve = subcommands.add_parser("serve")
+    serve.add_argument("--directory", required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    with ReplicationServer(DirectoryTransport(args.directory), (args.host, args.port)) as server:
+        print(f"Serving {args.directory} on {args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    from log_config import configure_logging
+    configure_logging()
+    main()
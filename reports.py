@@ -2,67 +2,99 @@ from rich.console import Console
 from rich.bar import Bar
 from rich.table import Table
 from rich.panel import Panel
-from collections import defaultdict
 from rich.progress import Progress, BarColumn, TimeRemainingColumn
+from pager import ItemPager
+from aggregates import merge_aggregates
+from datetime import datetime, timezone
 import logging
+import time
 
 class ReportGenerator:
+    # Window name -> (rollup level, seconds covered; None for all history)
+    TREND_WINDOWS = {
+        "24h": ("hour", 86400),
+        "30d": ("day", 30 * 86400),
+        "1y": ("month", 366 * 86400),
+        "all": ("month", None),
+    }
+    PERIOD_FORMATS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "month": "%Y-%m"}
+
     def __init__(self, inventory_manager):
         self.inventory_manager = inventory_manager
         self.console = Console()
         self.logger = logging.getLogger(__name__)
 
+    def _shard_partials(self):
+        """{shard name: InventoryAggregates} for a sharded inventory, else None."""
+        shard_aggregates = getattr(self.inventory_manager, "shard_aggregates", None)
+        return shard_aggregates.partials if shard_aggregates is not None else None
+
+    def _aggregates(self):
+        """Inventory-wide aggregates; for a sharded inventory, the merged per-shard partials."""
+        partials = self._shard_partials()
+        return merge_aggregates(partials.values()) if partials is not None else self.inventory_manager.aggregates
+
     def generate_summary(self):
-        inventory = self.inventory_manager.inventory
-        if not inventory:
+        aggregates = self._aggregates()
+        if not aggregates.item_count:
             self.logger.info("Inventory is empty. Nothing to summarize.")
             self.console.print("[bold red]No items in inventory.[/bold red]")
             return
 
-        total_items = sum(item["quantity"] for item in inventory)
-        total_value = sum(item["quantity"] * item["price"] for item in inventory)
+        total_items = aggregates.total_units
+        total_value = aggregates.total_value
 
         self.console.print(f"\n[bold cyan]Inventory Summary[/bold cyan]")
         self.console.print(f"Total items: [bold]{total_items}[/bold]")
         self.console.print(f"Total value: [bold]${total_value:.2f}[/bold]\n")
-        self.logger.info(f"Generated inventory summary: Total items={total_items}, Total value=${total_value:.2f}")
+        partials = self._shard_partials()
+        if partials is not None:
+            table = Table(title="By Shard", header_style="bold magenta")
+            table.add_column("Shard", style="cyan")
+            table.add_column("Items", justify="right")
+            table.add_column("Units", justify="right")
+            table.add_column("Value", justify="right")
+            for name, partial in partials.items():
+                table.add_row(name, str(partial.item_count), str(partial.total_units), f"${partial.total_value:.2f}")
+            self.console.print(table)
+        self.logger.info("Generated inventory summary: Total items=%s, Total value=$%.2f", total_items, total_value)
 
     def generate_low_stock_alert(self, threshold=10):
         """Display items with stock below the specified threshold."""
-        low_stock_items = [item for item in self.inventory_manager.inventory if item["quantity"] < threshold]
+        store = self.inventory_manager.store
+        pager = ItemPager(store.sorted_entries("quantity"), store.get, upper=threshold)
 
-        if not low_stock_items:
-            self.logger.info(f"No items found below the low stock threshold of {threshold}.")
+        if not pager.total():
+            self.logger.info("No items found below the low stock threshold of %s.", threshold)
             self.console.print(f"[bold green]No items below the threshold of {threshold}.[/bold green]")
             return
 
-        table = Table(title=f"Low-Stock Items (Threshold: {threshold})")
-        table.add_column("ID", style="cyan", justify="center")
-        table.add_column("Name", style="green")
-        table.add_column("Category", style="magenta")
-        table.add_column("Quantity", justify="right")
-        table.add_column("Price", justify="right")
+        extra_columns = ()
+        if self._shard_partials() is not None:
+            extra_columns = [("Shard", self.inventory_manager.datastore.shard_of)]
+        pager.browse(self.console, f"Low-Stock Items (Threshold: {threshold})", extra_columns=extra_columns)
+        self.logger.info("Generated low stock alert for items below threshold %s.", threshold)
 
-        for item in low_stock_items:
-            table.add_row(
-                str(item["id"]),
-                item["name"],
-                item["category"],
-                str(item["quantity"]),
-                f"${item['price']:.2f}"
-            )
+    def generate_reorder_alert(self):
+        """Display items that fell to or below their reorder point since the last check."""
+        crossed_items = self.inventory_manager.store.take_reorder_crossings()
 
-        self.console.print(table)
-        self.logger.info(f"Generated low stock alert for items below threshold {threshold}.")
-    
+        if not crossed_items:
+            self.logger.info("No items crossed their reorder point since the last check.")
+            self.console.print("[bold green]No items crossed their reorder point since the last check.[/bold green]")
+            return
+
+        ItemPager.from_items(crossed_items).browse(
+            self.console, "Items At or Below Reorder Point",
+            extra_columns=[("Reorder Point", lambda item: str(item["reorder_point"]))],
+        )
+        self.logger.info("Generated reorder alert for %s items.", len(crossed_items))
 
     def generate_category_distribution(self):
         """Generate a visually appealing category-wise stock distribution chart."""
 
-        # Collect stock distribution by category
-        category_distribution = defaultdict(int)
-        for item in self.inventory_manager.inventory:
-            category_distribution[item["category"]] += item["quantity"]
+        # Stock distribution by category is maintained incrementally
+        category_distribution = self._aggregates().category_units
 
         if not category_distribution:
             self.logger.info("No inventory items found for category distribution report.")
@@ -93,22 +125,53 @@ class ReportGenerator:
         self.console.print(table)
         self.logger.info("Generated category distribution report.")
     
-    def generate_inventory_value_trend(self):
-        """Generate inventory value trends."""
-        total_value = sum(item["quantity"] * item["price"] for item in self.inventory_manager.inventory)
+    def generate_inventory_value_trend(self, window="30d"):
+        """Show the inventory value per period over a window (see TREND_WINDOWS).
+
+        Periods come from the pre-aggregated rollups of the value history,
+        so the cost depends on the number of periods shown, not on the
+        number of recorded changes. The current totals close the last period.
+        """
+        aggregates = self.inventory_manager.aggregates
+        history = getattr(self.inventory_manager, "history", None)
+        level, span = self.TREND_WINDOWS[window]
+        now = time.time()
+        buckets = history.trend(level, now - span if span else None, latest=aggregates, now=now) if history else []
 
         self.console.print("\n[bold cyan]Inventory Value Trends:[/bold cyan]\n")
-        table = Table(title="Inventory Value Details")
-        table.add_column("Total Items", justify="right")
-        table.add_column("Total Value", justify="right")
+        if not buckets:
+            table = Table(title="Inventory Value Details")
+            table.add_column("Total Items", justify="right")
+            table.add_column("Total Value", justify="right")
+            table.add_row(str(aggregates.item_count), f"${aggregates.total_value:.2f}")
+            self.console.print(table)
+            self.console.print("[yellow]No value history recorded yet for this window.[/yellow]")
+            self.logger.info("Generated inventory value trend report without history.")
+            return
 
-        table.add_row(
-            str(len(self.inventory_manager.inventory)),
-            f"${total_value:.2f}"
-        )
+        table = Table(title=f"Inventory Value by {level.capitalize()} (UTC, window {window})",
+                      header_style="bold magenta")
+        table.add_column("Period", style="cyan")
+        for column in ("Items", "Units", "Value", "Low", "High", "Change"):
+            table.add_column(column, justify="right")
+        table.add_column("Trend", justify="left")
+
+        max_value = max(bucket["high"] for bucket in buckets) or 1
+        previous_close = buckets[0]["open"]
+        for bucket in buckets:
+            change = bucket["close"] - previous_close
+            previous_close = bucket["close"]
+            color = "green" if change >= 0 else "red"
+            table.add_row(
+                datetime.fromtimestamp(bucket["start"], timezone.utc).strftime(self.PERIOD_FORMATS[level]),
+                str(bucket["items"]),
+                str(bucket["units"]),
+                f"${bucket['close']:.2f}",
+                f"${bucket['low']:.2f}",
+                f"${bucket['high']:.2f}",
+                f"[{color}]{change:+.2f}[/{color}]",
+                f"[{color}]{'█' * int(max(bucket['close'], 0) / max_value * 20)}[/{color}]",
+            )
 
         self.console.print(table)
-        self.logger.info("Generated inventory value trend report.")
-
-
-
+        self.logger.info("Generated inventory value trend report over %s (%s periods).", window, len(buckets))
@@ -0,0 +1,98 @@
+from collections import defaultdict
+import heapq
+import sys
+
+class TrigramIndex:
+    """Inverted index of lower-cased character trigrams for substring search.
+
+    A query of three or more characters is answered by intersecting the
+    posting sets of its trigrams (smallest first) and verifying the
+    surviving candidates. Shorter queries fall back to scanning the
+    distinct indexed texts, which is cheap for low-cardinality fields such
+    as categories.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        # Postings hold distinct texts rather than item IDs, so items sharing a
+        # text (e.g. a category) cost one set entry instead of one per trigram.
+        self._postings = defaultdict(set)
+        self._texts = {}
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _text(self, item):
+        # Interned, so the text is shared with other indexes keyed on it
+        return sys.intern(self.key(item).lower())
+
+    def add(self, item):
+        text = self._text(item)
+        ids = self._texts.get(text)
+        if ids is None:
+            ids = self._texts[text] = set()
+            for gram in self._trigrams(text):
+                self._postings[gram].add(text)
+        ids.add(item["id"])
+
+    def remove(self, item):
+        text = self._text(item)
+        ids = self._texts.get(text)
+        if ids is None:
+            return
+        ids.discard(item["id"])
+        if not ids:
+            del self._texts[text]
+            for gram in self._trigrams(text):
+                texts = self._postings.get(gram)
+                if texts is not None:
+                    texts.discard(text)
+                    if not texts:
+                        del self._postings[gram]
+
+    def update(self, old_item, item):
+        if self._text(old_item) != self._text(item):
+            self.remove(old_item)
+            self.add(item)
+
+    def _matching_texts(self, query):
+        grams = self._trigrams(query)
+        if not grams:
+            return [text for text in self._texts if query in text]
+
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for texts in postings[1:]:
+            if not candidates:
+                break
+            candidates &= texts
+        # Trigram hits can come from different positions, so verify.
+        return [text for text in candidates if query in text]
+
+    def search(self, query, limit=None):
+        """Return (ranked IDs, total matches) for a case-insensitive substring query.
+
+        Exact matches rank first, then prefix matches, then matches at a word
+        start, then any other match; ties go to the shorter text and lower ID.
+        """
+        query = query.lower()
+        texts = self._matching_texts(query)
+
+        def ranked():
+            for text in texts:
+                if text == query:
+                    tier = 0
+                elif text.startswith(query):
+                    tier = 1
+                elif f" {query}" in text:
+                    tier = 2
+                else:
+                    tier = 3
+                for item_id in self._texts[text]:
+                    yield tier, len(text), item_id
+
+        total = sum(len(self._texts[text]) for text in texts)
+        if limit is None:
+            return [item_id for _, _, item_id in sorted(ranked())], total
+        return [item_id for _, _, item_id in heapq.nsmallest(limit, ranked())], total
@@ -0,0 +1,360 @@
+"""Local HTTP/JSON service exposing inventory operations.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--flush-interval 0.01] [--refresh-interval 0.5]
+
+Endpoints:
+    GET    /items/<id>
+    GET    /items?name=..|category=..|min_price=..&max_price=..[&limit=..]
+    POST   /items                      {"name", "category", "quantity", "price", "reorder_point"?, "warehouse"?}
+    PATCH  /items/<id>                 any subset of the editable fields, "expected_version"?
+    DELETE /items/<id>
+    POST   /items/<id>/adjust          {"delta": n, "op_id"?}
+    POST   /items/<id>/reserve         {"amount": n, "op_id"?}
+    POST   /items/<id>/release         {"amount": n, "op_id"?}
+    POST   /items/<id>/fulfil          {"amount": n, "op_id"?}
+    GET    /reports/summary
+    GET    /reports/categories
+    GET    /reports/low-stock?threshold=10[&limit=..]
+    GET    /metrics                    latency histograms and counters (Prometheus text)
+
+Every InventoryAPI call runs on one dedicated worker thread, so the event
+loop never waits on the store's file lock or disk and calls never interleave.
+Reads are answered straight from the in-memory indexes; a background task
+picks up other processes' changes once per refresh interval. Writes are
+applied in memory at once and then wait for a group commit: every write that
+arrives within one flush interval is persisted in a single batch, and the
+responses are sent once that batch is on disk. New items are the
+exception: they are written as they are created, so their IDs cannot be
+handed out again by another process. Stock changes to the same
+item within one interval are coalesced into a single persisted record;
+an optional op_id makes a retried stock change safe to resend to the same
+server process (applied op_ids are not kept across restarts).
+"""
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+from inventory_api import ConflictError, InventoryAPI, InsufficientStockError, ItemNotFoundError
+from log_config import configure_logging
+from metrics import REGISTRY, timed
+
+MAX_BODY_SIZE = 1 << 20
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class WriteBatcher:
+    """Group-commits pending InventoryAPI changes.
+
+    Callers await `commit()` after mutating the API; a single background
+    task flushes everything pending once per interval (off the event loop,
+    since persisting may fsync) and wakes all waiters of that batch.
+    The flush runs on `api_executor`, the thread that makes all other API
+    calls.
+    """
+
+    def __init__(self, api, api_executor, flush_interval=0.01):
+        self.api = api
+        self.api_executor = api_executor
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._waiters = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._flush()
+
+    def commit(self):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._wakeup.set()
+        return future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self):
+        waiters, self._waiters = self._waiters, []
+        loop = asyncio.get_running_loop()
+        # Flush on the API thread, between mutations; writes arriving during
+        # the flush join the next batch.
+        try:
+            written = await loop.run_in_executor(self.api_executor, self.api.flush)
+            if written:
+                self.logger.info("Persisted a batch of %s change(s) for %s request(s).", written, len(waiters))
+        except Exception as e:
+            self.logger.error("Error persisting batch: %s", e)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class InventoryServer:
+    def __init__(self, api, flush_interval=0.01, refresh_interval=0.5):
+        self.api = api
+        self.refresh_interval = refresh_interval
+        self._api_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventory-api")
+        self.batcher = WriteBatcher(api, self._api_executor, flush_interval)
+        self.logger = logging.getLogger(__name__)
+        self.routes = {
+            ("GET", "items"): self.get_items,
+            ("POST", "items"): self.create_item,
+            ("GET", "item"): self.get_item,
+            ("PATCH", "item"): self.update_item,
+            ("DELETE", "item"): self.delete_item,
+            ("POST", "adjust"): self.adjust,
+            ("POST", "reserve"): self.reserve,
+            ("POST", "release"): self.release,
+            ("POST", "fulfil"): self.fulfil,
+            ("GET", "summary"): self.summary,
+            ("GET", "categories"): self.categories,
+            ("GET", "low-stock"): self.low_stock,
+            ("GET", "metrics"): self.metrics,
+        }
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        refresher = asyncio.create_task(self._refresh_periodically())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.logger.info("Inventory service listening on %s:%s", host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
+            await self.batcher.stop()
+            self._api_executor.shutdown(wait=True)
+
+    async def _call(self, function, *args, **kwargs):
+        """Run an API call on the API thread."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._api_executor, partial(function, *args, **kwargs)
+        )
+
+    async def _refresh_periodically(self):
+        """Pick up changes persisted by other processes; writes also sync before applying."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self._call(self.api.refresh)
+            except Exception as e:
+                self.logger.error("Error refreshing inventory: %s", e)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            # Items may be row views of the compact store; serialize them as dicts.
+            body, content_type = json.dumps(payload, default=dict).encode(), "application/json"
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    def _route(self, method, path):
+        parts = [part for part in path.split("/") if part]
+        if parts in (["items"], ["metrics"]):
+            key, args = parts[0], ()
+        elif len(parts) in (2, 3) and parts[0] == "items":
+            try:
+                args = (int(parts[1]),)
+            except ValueError:
+                raise HTTPError(400, "Item ID must be an integer.")
+            key = "item" if len(parts) == 2 else parts[2]
+        elif len(parts) == 2 and parts[0] == "reports":
+            key, args = parts[1], ()
+        else:
+            raise HTTPError(404, "Unknown endpoint.")
+        handler = self.routes.get((method, key))
+        if handler is None:
+            if any(route_key == key for _, route_key in self.routes):
+                raise HTTPError(405, f"{method} is not allowed here.")
+            raise HTTPError(404, "Unknown endpoint.")
+        return handler, args
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            handler, args = self._route(method, url.path)
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(400, "Request body must be a JSON object.")
+            with timed(f"http.{handler.__name__}"):
+                if asyncio.iscoroutinefunction(handler):
+                    return await handler(*args, query=query, data=data)
+                return await self._call(handler, *args, query=query, data=data)
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except ItemNotFoundError as e:
+            return 404, {"error": str(e)}
+        except (ConflictError, InsufficientStockError) as e:
+            return 409, {"error": str(e)}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            self.logger.error("Error handling %s %s: %s", method, target, e)
+            return 500, {"error": "Internal server error."}
+
+    @staticmethod
+    def _limit(query, default=100):
+        limit = int(query.get("limit", default))
+        if limit < 0:
+            raise HTTPError(400, "Limit must not be negative.")
+        return limit
+
+    # Synchronous handlers run on the API thread; they return copies of the
+    # items, which are serialized on the event loop.
+    def get_item(self, item_id, query, data):
+        return 200, dict(self.api.get_item(item_id))
+
+    def get_items(self, query, data):
+        items, total = self.api.find_items(
+            name=query.get("name"),
+            category=query.get("category"),
+            min_price=query.get("min_price"),
+            max_price=query.get("max_price"),
+            limit=self._limit(query),
+        )
+        return 200, {"items": [dict(item) for item in items], "total": total}
+
+    async def _write(self, status, mutation, *args, **kwargs):
+        """Apply a mutation on the API thread, then wait for its group commit."""
+        item = await self._call(lambda: dict(mutation(*args, **kwargs)))
+        await self.batcher.commit()
+        return status, item
+
+    async def create_item(self, query, data):
+        return await self._write(
+            201, self.api.create_item,
+            data.get("name"), data.get("category"), data.get("quantity"), data.get("price"),
+            data.get("reorder_point"), data.get("warehouse"),
+        )
+
+    async def update_item(self, item_id, query, data):
+        return await self._write(200, self.api.update_item, item_id, **data)
+
+    async def delete_item(self, item_id, query, data):
+        return await self._write(200, self.api.remove_item, item_id)
+
+    async def adjust(self, item_id, query, data):
+        return await self._write(200, self.api.adjust_quantity, item_id, data.get("delta"), op_id=data.get("op_id"))
+
+    async def reserve(self, item_id, query, data):
+        return await self._write(200, self.api.reserve, item_id, data.get("amount"), op_id=data.get("op_id"))
+
+    async def release(self, item_id, query, data):
+        return await self._write(200, self.api.release, item_id, data.get("amount"), op_id=data.get("op_id"))
+
+    async def fulfil(self, item_id, query, data):
+        return await self._write(200, self.api.fulfil, item_id, data.get("amount"), op_id=data.get("op_id"))
+
+    def summary(self, query, data):
+        aggregates = self.api.aggregates
+        return 200, {
+            "item_count": aggregates.item_count,
+            "total_units": aggregates.total_units,
+            "total_value": round(aggregates.total_value, 2),
+        }
+
+    def categories(self, query, data):
+        aggregates = self.api.aggregates
+        return 200, {
+            category: {"units": units, "value": round(aggregates.category_value[category], 2)}
+            for category, units in aggregates.category_units.items()
+        }
+
+    def low_stock(self, query, data):
+        threshold = float(query.get("threshold", 10))
+        items, total = self.api.store.find_quantity_below(threshold, self._limit(query))
+        return 200, {"items": [dict(item) for item in items], "total": total}
+
+    def metrics(self, query, data):
+        return 200, REGISTRY.to_prometheus()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve inventory operations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--flush-interval", type=float, default=0.01,
+                        help="Seconds to gather writes into one persisted batch.")
+    parser.add_argument("--refresh-interval", type=float, default=0.5,
+                        help="Seconds between checks for changes made by other processes.")
+    args = parser.parse_args(argv)
+
+    api = InventoryAPI(batch_writes=True)
+    server = InventoryServer(api, flush_interval=args.flush_interval, refresh_interval=args.refresh_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.flush()
+        api.datastore.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
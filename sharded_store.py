@@ -0,0 +1,187 @@
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+import logging
+import os
+import threading
+from storage import StorageBackend
+
+
+def open_shard(backend, path, snapshot_format="json"):
+    """Build the storage backend of one shard."""
+    if backend == "json":
+        from datastore import DataStore
+        return DataStore(file_path=path, snapshot_format=snapshot_format)
+    if backend == "sqlite":
+        from sqlite_store import SQLiteStore
+        return SQLiteStore(path, "inventory")
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def _load_shard(backend, path, snapshot_format):
+    # Runs in a worker process; the items and how far they were read are
+    # pickled back for the parent's shard object to resume from.
+    store = open_shard(backend, path, snapshot_format)
+    try:
+        return store.load_data(), store.read_position()
+    finally:
+        store.close()
+
+
+class ShardedStore(StorageBackend):
+    """Inventory split over several shards, each with its own backend.
+
+    `shard_by` decides which shard an item lives in:
+
+    * "warehouse": the shard named by the item's "warehouse" field; items
+      without one go to the first shard.
+    * "category": shards are named by the lowest category they hold (e.g.
+      "a", "h", "p" splits categories into a-g, h-o and p-z, compared
+      case-insensitively); the first shard also takes anything sorting
+      before its name.
+
+    Shards load in parallel in a process pool, so parsing uses several
+    cores. Each worker also reports how far it read the shard's log, and
+    the parent's shard object resumes polling from there. Changes are
+    grouped per shard and appended to each shard's
+    own backend; an item whose shard key changes is deleted from its old
+    shard and added to the new one.
+    """
+
+    def __init__(self, shard_paths, shard_by="warehouse", backend="json", snapshot_format="json", max_workers=None):
+        if shard_by not in ("warehouse", "category"):
+            raise ValueError(f"Unknown shard key: {shard_by}")
+        if not shard_paths:
+            raise ValueError("At least one shard is required.")
+        self.shard_paths = dict(shard_paths)
+        self.shard_names = list(self.shard_paths)
+        self.shard_by = shard_by
+        self.backend = backend
+        self.snapshot_format = snapshot_format
+        self.max_workers = max_workers or min(len(self.shard_names), os.cpu_count() or 1)
+        self.shards = {name: open_shard(backend, path, snapshot_format) for name, path in self.shard_paths.items()}
+        self._category_bounds = sorted((name.lower(), name) for name in self.shard_names)
+        self._item_shards = {}
+        self._held = threading.local()
+        self.logger = logging.getLogger(__name__)
+
+    def shard_of(self, item):
+        """Name of the shard an item belongs to; ValueError for an unknown warehouse."""
+        if self.shard_by == "warehouse":
+            warehouse = item.get("warehouse")
+            if warehouse in (None, ""):
+                return self.shard_names[0]
+            if warehouse not in self.shards:
+                raise ValueError(f"Unknown warehouse: {warehouse}. Known: {', '.join(self.shard_names)}.")
+            return warehouse
+        position = bisect_right(self._category_bounds, (item["category"].lower(), "￿")) - 1
+        return self._category_bounds[max(position, 0)][1]
+
+    def load_data(self):
+        """Load all shards in parallel and return their items as one list."""
+        # While this thread holds the shard locks (a reload from within
+        # lock()), worker processes would wait for them forever.
+        if len(self.shards) == 1 or self.max_workers == 1 or getattr(self._held, "depth", 0):
+            results = [self.shards[name].load_data() for name in self.shard_names]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(_load_shard, self.backend, self.shard_paths[name], self.snapshot_format)
+                    for name in self.shard_names
+                ]
+                results = []
+                for name, future in zip(self.shard_names, futures):
+                    items, position = future.result()
+                    self.shards[name].resume_from(position)
+                    results.append(items)
+        data = []
+        self._item_shards = {}
+        for name, items in zip(self.shard_names, results):
+            self.logger.info("Loaded %s item(s) from shard %s", len(items), name)
+            for item in items:
+                self._item_shards[item["id"]] = name
+            data.extend(items)
+        return data
+
+    def iter_items(self):
+        self._item_shards = {}
+        for name in self.shard_names:
+            for item in self.shards[name].iter_items():
+                self._item_shards[item["id"]] = name
+                yield item
+
+    def save_data(self, data):
+        """Replace the contents of every shard with the given items."""
+        partitions = {name: [] for name in self.shard_names}
+        for item in data:
+            partitions[self.shard_of(item)].append(item)
+        for name, items in partitions.items():
+            self.shards[name].save_data(items)
+        self._item_shards = {item["id"]: name for name, items in partitions.items() for item in items}
+
+    def append_changes(self, changes):
+        """Route each change to its shard and append every shard's changes in one write."""
+        per_shard = {}
+        for op, item in changes:
+            previous = self._item_shards.get(item["id"])
+            if op == "delete":
+                shard = previous or self.shard_of(item)
+                per_shard.setdefault(shard, []).append((op, item))
+                self._item_shards.pop(item["id"], None)
+                continue
+            shard = self.shard_of(item)
+            if previous is not None and previous != shard:
+                per_shard.setdefault(previous, []).append(("delete", item))
+                op = "add"
+            per_shard.setdefault(shard, []).append((op, item))
+            self._item_shards[item["id"]] = shard
+        for name, shard_changes in per_shard.items():
+            self.shards[name].append_changes(shard_changes)
+
+    @property
+    def version(self):
+        return sum(shard.version for shard in self.shards.values())
+
+    @contextmanager
+    def lock(self):
+        """Hold every shard's lock, always taken in shard order."""
+        with ExitStack() as stack:
+            for name in self.shard_names:
+                stack.enter_context(self.shards[name].lock())
+            self._held.depth = getattr(self._held, "depth", 0) + 1
+            try:
+                yield self
+            finally:
+                self._held.depth -= 1
+
+    def poll_changes(self):
+        per_shard = []
+        for name in self.shard_names:
+            shard_records = self.shards[name].poll_changes()
+            if shard_records is None:
+                return None
+            per_shard.append((name, shard_records))
+            for record in shard_records:
+                if record["op"] == "delete":
+                    if self._item_shards.get(record["id"]) == name:
+                        self._item_shards.pop(record["id"])
+                else:
+                    self._item_shards[record["item"]["id"]] = name
+        # A move shows up as a delete in the old shard and an add in the new
+        # one; drop the delete so the order shards are read in does not matter.
+        return [
+            record for name, shard_records in per_shard for record in shard_records
+            if record["op"] != "delete" or self._item_shards.get(record["id"], name) == name
+        ]
+
+    def compact(self, wait=False):
+        for shard in self.shards.values():
+            shard.compact(wait=wait)
+
+    def wait_for_compaction(self):
+        for shard in self.shards.values():
+            shard.wait_for_compaction()
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
@@ -0,0 +1,198 @@
+"""Versioned binary inventory snapshot that can be memory-mapped.
+
+Layout (all integers little-endian):
+
+    header    magic b"INVSNAP\\0", u16 version, u16 reserved, u64 item count
+    sections  one (u64 offset, u64 length) pair per entry in SECTIONS
+    data      8-byte aligned sections:
+              ids           int64[count]
+              quantities    int64[count]
+              prices        float64[count]
+              categories    int32[count] codes into category_names
+              name_ends     int64[count] end offsets into names
+              names         UTF-8 bytes of all names, back to back
+              category_names  JSON list of category strings
+              extras        JSON object {row index: {field: value}} for
+                            fields other than the core five and counters
+              versions      int64[count] "version" of each row, -1 if none
+              reserved      int64[count] "reserved" of each row, -1 if none
+
+Version 1 files, which have no counter sections and keep those fields in
+extras, are still read.
+
+Readers map the file and decode rows on demand, so opening a snapshot
+costs the same regardless of its size.
+"""
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"INVSNAP\0"
+VERSION = 2
+HEADER = struct.Struct("<8sHHQ")
+SECTION = struct.Struct("<QQ")
+SECTIONS_V1 = ("ids", "quantities", "prices", "categories", "name_ends", "names", "category_names", "extras")
+SECTIONS = SECTIONS_V1 + ("versions", "reserved")
+CORE_FIELDS = ("id", "name", "category", "quantity", "price")
+# Counter field -> its section
+COUNTER_SECTIONS = {"version": "versions", "reserved": "reserved"}
+
+
+def _is_counter(field, value):
+    return field in COUNTER_SECTIONS and type(value) is int and 0 <= value < 1 << 63
+
+
+def _le_bytes(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(path, items):
+    """Write items to path atomically (temporary file, fsync, rename)."""
+    ids, quantities, prices = array("q"), array("q"), array("d")
+    codes, name_ends = array("i"), array("q")
+    names = bytearray()
+    counters = {field: array("q") for field in COUNTER_SECTIONS}
+    category_names, category_codes, extras = [], {}, {}
+    for row, item in enumerate(items):
+        ids.append(item["id"])
+        quantities.append(int(item["quantity"]))
+        prices.append(float(item["price"]))
+        code = category_codes.get(item["category"])
+        if code is None:
+            code = category_codes[item["category"]] = len(category_names)
+            category_names.append(item["category"])
+        codes.append(code)
+        names += item["name"].encode()
+        name_ends.append(len(names))
+        for field, column in counters.items():
+            value = item.get(field)
+            column.append(value if _is_counter(field, value) else -1)
+        extra = {
+            field: value for field, value in item.items()
+            if field not in CORE_FIELDS and not _is_counter(field, value)
+        }
+        if extra:
+            extras[row] = extra
+
+    sections = [
+        _le_bytes(ids), _le_bytes(quantities), _le_bytes(prices), _le_bytes(codes), _le_bytes(name_ends),
+        bytes(names), json.dumps(category_names).encode(), json.dumps(extras).encode(),
+        _le_bytes(counters["version"]), _le_bytes(counters["reserved"]),
+    ]
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    for data in sections:
+        offset += -offset % 8
+        table.append((offset, len(data)))
+        offset += len(data)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(ids)))
+        for section in table:
+            file.write(SECTION.pack(*section))
+        for (section_offset, _), data in zip(table, sections):
+            file.write(b"\0" * (section_offset - file.tell()))
+            file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class BinarySnapshot:
+    """Read-only, memory-mapped view of a snapshot file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, self.count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an inventory snapshot.")
+            if version not in (1, VERSION):
+                raise ValueError(f"Unsupported snapshot version {version} in {path}.")
+            self._sections = {
+                name: SECTION.unpack_from(self._mmap, HEADER.size + index * SECTION.size)
+                for index, name in enumerate(SECTIONS if version == VERSION else SECTIONS_V1)
+            }
+            self._buffer = memoryview(self._mmap)
+            self.ids = self._column("ids", "q")
+            self.quantities = self._column("quantities", "q")
+            self.prices = self._column("prices", "d")
+            self.categories = self._column("categories", "i")
+            self.name_ends = self._column("name_ends", "q")
+            self.names = self._section("names")
+            self.category_names = json.loads(bytes(self._section("category_names")))
+            # Field -> column, or None in version 1 files
+            self.counters = {
+                field: self._column(section, "q") if section in self._sections else None
+                for field, section in COUNTER_SECTIONS.items()
+            }
+            self._extras = None
+        except Exception:
+            self.close()
+            raise
+
+    def _section(self, name):
+        offset, length = self._sections[name]
+        return self._buffer[offset:offset + length]
+
+    def _column(self, name, typecode):
+        section = self._section(name)
+        if sys.byteorder == "little":
+            return section.cast(typecode)
+        values = array(typecode, section.tobytes())
+        values.byteswap()
+        return values
+
+    @property
+    def extras(self):
+        if self._extras is None:
+            self._extras = {int(row): extra for row, extra in json.loads(bytes(self._section("extras"))).items()}
+        return self._extras
+
+    def __len__(self):
+        return self.count
+
+    def item(self, row):
+        """Decode one row into an item dict."""
+        start = self.name_ends[row - 1] if row else 0
+        item = {
+            "id": self.ids[row],
+            "name": bytes(self.names[start:self.name_ends[row]]).decode(),
+            "category": self.category_names[self.categories[row]],
+            "quantity": self.quantities[row],
+            "price": self.prices[row],
+        }
+        for field, column in self.counters.items():
+            if column is not None and column[row] >= 0:
+                item[field] = column[row]
+        item.update(self.extras.get(row, {}))
+        return item
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.item(row)
+
+    def close(self):
+        for view in self.__dict__.pop("counters", {}).values():
+            if isinstance(view, memoryview):
+                view.release()
+        for name in ("ids", "quantities", "prices", "categories", "name_ends", "names", "_buffer"):
+            view = self.__dict__.pop(name, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
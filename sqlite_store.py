@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import logging
+import threading
+from filelock import FileLock
+from storage import StorageBackend
+
+ITEM_COLUMNS = ("id", "name", "category", "quantity", "price")
+# Change records kept per collection for other processes to catch up from;
+# one that falls further behind reloads everything.
+CHANGES_KEPT = 10_000
+
+SCHEMAS = {
+    "inventory": [
+        """CREATE TABLE IF NOT EXISTS inventory (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            price REAL NOT NULL,
+            attributes TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory (category)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_price ON inventory (price)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory (quantity)",
+        """CREATE TABLE IF NOT EXISTS inventory_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            record TEXT NOT NULL
+        )""",
+    ],
+    "users": [
+        """CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS users_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            record TEXT NOT NULL
+        )""",
+    ],
+}
+KEYS = {"inventory": "id", "users": "username"}
+
+# Statements are kept as constants so sqlite3's statement cache reuses the
+# prepared form on every call.
+UPSERT_ITEM = (
+    "INSERT INTO inventory (id, name, category, quantity, price, attributes) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET name = excluded.name, category = excluded.category, "
+    "quantity = excluded.quantity, price = excluded.price, attributes = excluded.attributes"
+)
+DELETE_ITEM = "DELETE FROM inventory WHERE id = ?"
+SELECT_ITEMS = "SELECT id, name, category, quantity, price, attributes FROM inventory"
+UPSERT_USER = (
+    "INSERT INTO users (username, data) VALUES (?, ?) "
+    "ON CONFLICT(username) DO UPDATE SET data = excluded.data"
+)
+DELETE_USER = "DELETE FROM users WHERE username = ?"
+INSERT_CHANGE = "INSERT INTO {collection}_changes (record) VALUES (?)"
+SELECT_CHANGES = "SELECT seq, record FROM {collection}_changes WHERE seq > ? ORDER BY seq"
+LAST_CHANGE = "SELECT COALESCE(MAX(seq), 0) FROM {collection}_changes"
+PRUNE_CHANGES = "DELETE FROM {collection}_changes WHERE seq <= ?"
+
+
+class SQLiteStore(StorageBackend):
+    """SQLite storage backend.
+
+    Uses one long-lived connection in WAL mode. The inventory collection
+    keeps the core item fields in indexed columns (any other fields go into
+    a JSON `attributes` column); the users collection stores one JSON
+    record per username. Like the JSON store, it is loaded in full into the
+    in-memory indexes, which answer searches and reports.
+
+    Every change is also recorded, with a sequence number, in a
+    `<collection>_changes` table in the same transaction, so other
+    processes read only the records after the last one they saw (in the
+    same format as DataStore's change log). The newest CHANGES_KEPT records
+    are kept; `save_data` and falling further behind mean a full reload.
+    """
+
+    def __init__(self, db_path="data/inventory.db", collection="inventory"):
+        if collection not in SCHEMAS:
+            raise ValueError(f"Unknown collection: {collection}")
+        self.db_path = db_path
+        self.collection = collection
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+        self._lock = threading.Lock()
+        self.file_lock = FileLock(f"{self.db_path}.lock")
+        self.key = KEYS[collection]
+        self._statements = {
+            name: statement.format(collection=collection)
+            for name, statement in (
+                ("insert_change", INSERT_CHANGE), ("select_changes", SELECT_CHANGES),
+                ("last_change", LAST_CHANGE), ("prune_changes", PRUNE_CHANGES),
+            )
+        }
+        # Sequence number of the last change record seen; doubles as the version
+        self.version = 0
+        # Records of other processes read while appending, not yet returned by poll_changes
+        self._unseen = []
+        self._needs_reload = False
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=64)
+        self.connection.row_factory = sqlite3.Row
+        with self._lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMAS[collection]:
+                self.connection.execute(statement)
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        # Changes whenever another connection commits to the database
+        with self._lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def lock(self):
+        return self.file_lock
+
+    def poll_changes(self):
+        """Return the change records other processes committed since the last load or poll.
+
+        Returns None when some of them were pruned already (or the whole
+        collection was replaced); the caller then has to reload.
+        """
+        data_version = self._read_data_version()
+        with self._lock:
+            if data_version != self._data_version:
+                self._data_version = data_version
+                records = self._read_changes()
+                if records is None:
+                    self._needs_reload = True
+                else:
+                    self._unseen.extend(records)
+            if self._needs_reload:
+                return None
+            records, self._unseen = self._unseen, []
+        return records
+
+    def read_position(self):
+        with self._lock:
+            return {"version": self.version}
+
+    def resume_from(self, position):
+        with self._lock:
+            self.version = position["version"]
+            # data_version is per connection, so read the change table on the next poll
+            self._data_version = None
+            self._unseen = []
+            self._needs_reload = False
+
+    def _read_changes(self):
+        """Change records after the last one seen, or None if they cannot all be read (self._lock held)."""
+        rows = self.connection.execute(self._statements["select_changes"], (self.version,)).fetchall()
+        if rows and rows[0]["seq"] != self.version + 1:
+            return None  # Pruned before we saw them
+        records = []
+        for row in rows:
+            record = json.loads(row["record"])
+            if record["op"] == "reload":
+                return None
+            record["seq"] = row["seq"]
+            records.append(record)
+        if records:
+            self.version = records[-1]["seq"]
+        return records
+
+    def _record_change(self, record):
+        """Add a change record in the current transaction and advance past it (self._lock held)."""
+        cursor = self.connection.execute(self._statements["insert_change"], (json.dumps(record, separators=(",", ":")),))
+        self.version = cursor.lastrowid
+
+    def _start_reading(self):
+        """Note where the change records end before reading the collection (self._lock held)."""
+        self._data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        self.version = self.connection.execute(self._statements["last_change"]).fetchone()[0]
+        self._unseen = []
+        self._needs_reload = False
+
+    @staticmethod
+    def _item_row(item):
+        attributes = {key: value for key, value in item.items() if key not in ITEM_COLUMNS}
+        return (
+            item["id"], item["name"], item["category"], item["quantity"], item["price"],
+            json.dumps(attributes) if attributes else None,
+        )
+
+    @staticmethod
+    def _row_item(row):
+        item = {column: row[column] for column in ITEM_COLUMNS}
+        if row["attributes"]:
+            item.update(json.loads(row["attributes"]))
+        return item
+
+    def load_data(self):
+        """Load the whole collection."""
+        self.logger.info("Loading %s from %s", self.collection, self.db_path)
+        if self.collection == "users":
+            with self._lock:
+                self._start_reading()
+                rows = self.connection.execute("SELECT username, data FROM users").fetchall()
+            return {row["username"]: json.loads(row["data"]) for row in rows}
+        return list(self.iter_items())
+
+    def iter_items(self, batch_size=1000):
+        """Stream inventory items in ID order without loading them all at once."""
+        with self._lock:
+            # Changes committed while streaming are polled again later; replaying them is harmless
+            self._start_reading()
+            cursor = self.connection.execute(f"{SELECT_ITEMS} ORDER BY id")
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield self._row_item(row)
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    def save_data(self, data):
+        """Replace the whole collection in a single transaction."""
+        with self._lock, self.connection:
+            if self.collection == "users":
+                self.connection.execute("DELETE FROM users")
+                self.connection.executemany(
+                    UPSERT_USER, ((username, json.dumps(user)) for username, user in data.items())
+                )
+            else:
+                self.connection.execute("DELETE FROM inventory")
+                self.connection.executemany(UPSERT_ITEM, (self._item_row(item) for item in data))
+            # Other processes cannot replay a full replacement; tell them to reload
+            self._record_change({"op": "reload"})
+            self._unseen = []
+            self._needs_reload = False
+        self.logger.info("Data saved to %s (%s)", self.db_path, self.collection)
+
+    def append_changes(self, changes):
+        """Apply several (op, item) changes in one transaction."""
+        for op, _ in changes:
+            if op not in ("add", "update", "delete"):
+                raise ValueError(f"Unknown change operation: {op}")
+        if not changes:
+            return
+        with self._lock, self.connection:
+            # Take the write lock first, so the records read below are all that precede ours
+            self.connection.execute("BEGIN IMMEDIATE")
+            records = self._read_changes()
+            if records is None:
+                self._needs_reload = True
+            else:
+                self._unseen.extend(records)
+            for op, item in changes:
+                if op == "delete":
+                    self._record_change({"op": op, self.key: item[self.key]})
+                else:
+                    self._record_change({"op": op, "item": item})
+                if self.collection == "users":
+                    if op == "delete":
+                        self.connection.execute(DELETE_USER, (item["username"],))
+                    else:
+                        user = {key: value for key, value in item.items() if key != "username"}
+                        self.connection.execute(UPSERT_USER, (item["username"], json.dumps(user)))
+                elif op == "delete":
+                    self.connection.execute(DELETE_ITEM, (item["id"],))
+                else:
+                    self.connection.execute(UPSERT_ITEM, self._item_row(item))
+            self.connection.execute(self._statements["prune_changes"], (self.version - CHANGES_KEPT,))
+        self.logger.info("Applied %s change(s) to %s (%s)", len(changes), self.db_path, self.collection)
+
+    def compact(self, wait=False):
+        """Checkpoint the write-ahead log into the main database file."""
+        with self._lock:
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,106 @@
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+import os
+import config
+
+
+class ReadOnlyError(ValueError):
+    """Raised when something tries to change a read-only backend (a replica)."""
+
+    def __init__(self):
+        super().__init__("This inventory is a read-only replica; make changes on the primary.")
+
+
+class StorageBackend(ABC):
+    """Interface shared by the persistence backends.
+
+    A backend stores one collection: the inventory (a list of item dicts
+    keyed by "id") or the users (a dict keyed by username). Single-item
+    changes go through `append_change`/`append_changes` so backends can
+    persist them without rewriting the whole collection.
+
+    Backends that other processes may write to concurrently provide a
+    cross-process `lock()` and report those writes through `poll_changes`;
+    `version` grows with every change the backend has seen. Backends
+    that only mirror another store (replicas) set `read_only`.
+    """
+
+    version = 0
+    read_only = False
+
+    @abstractmethod
+    def load_data(self):
+        """Load the whole collection."""
+
+    @abstractmethod
+    def save_data(self, data):
+        """Replace the whole collection."""
+
+    @abstractmethod
+    def append_changes(self, changes):
+        """Persist several (op, item) changes, op being "add", "update" or "delete"."""
+
+    def append_change(self, op, item):
+        """Persist a single add/update/delete."""
+        self.append_changes([(op, item)])
+
+    def iter_items(self):
+        """Yield the items of the collection one at a time."""
+        yield from self.load_data()
+
+    def lock(self):
+        """Context manager excluding other processes' writes (a no-op by default)."""
+        return nullcontext()
+
+    def poll_changes(self):
+        """Change records written by other processes since the last load/poll; None if a reload is needed."""
+        return []
+
+    def read_position(self):
+        """How far the last load read, as a picklable value for `resume_from`; None if not tracked."""
+        return None
+
+    def resume_from(self, position):
+        """Continue polling from where another instance on the same storage (e.g. in a worker process) loaded."""
+
+    def compact(self, wait=False):
+        """Fold incremental changes into the main storage, if the backend keeps any."""
+
+    def wait_for_compaction(self):
+        """Block until background maintenance has finished."""
+
+    def close(self):
+        """Release any resources held by the backend."""
+        self.wait_for_compaction()
+
+
+def create_datastore(collection, backend=None):
+    """Build the configured storage backend for a collection ("inventory" or "users")."""
+    if collection == "inventory" and config.REPLICA_SOURCE:
+        from replication import ReplicaStore, open_transport
+        cache_path = os.path.join(config.DATA_DIR, "replica", "inventory.json")
+        return ReplicaStore(open_transport(config.REPLICA_SOURCE), cache_path)
+    datastore = _create_backend(collection, backend or config.STORAGE_BACKEND)
+    if collection == "inventory" and config.REPLICATION_DIR:
+        from replication import DirectoryTransport, PublishingStore
+        return PublishingStore(datastore, DirectoryTransport(config.REPLICATION_DIR))
+    return datastore
+
+
+def _create_backend(collection, backend):
+    if collection == "inventory" and config.SHARD_BY:
+        from sharded_store import ShardedStore
+        extension = "db" if backend == "sqlite" else "json"
+        shard_paths = {name: os.path.join(config.DATA_DIR, "shards", f"{name}.{extension}") for name in config.SHARDS}
+        return ShardedStore(shard_paths, config.SHARD_BY, backend, config.SNAPSHOT_FORMAT)
+    if backend == "json":
+        from datastore import DataStore
+        file_path = os.path.join(config.DATA_DIR, f"{collection}.json")
+        if collection == "users":
+            # Users stay a JSON mapping keyed by username
+            return DataStore(file_path=file_path, key="username")
+        return DataStore(file_path=file_path, snapshot_format=config.SNAPSHOT_FORMAT)
+    if backend == "sqlite":
+        from sqlite_store import SQLiteStore
+        return SQLiteStore(os.path.join(config.DATA_DIR, config.SQLITE_DATABASE), collection)
+    raise ValueError(f"Unknown storage backend: {backend}")
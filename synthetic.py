@@ -0,0 +1,65 @@
+"""Seeded synthetic inventory and user data for benchmarks and demos.
+
+The same seed always produces the same data. Categories follow a Zipf-like
+distribution (a few large categories, a long tail of small ones), names are
+built from brand/adjective/noun/model parts so they share realistic
+prefixes and words, prices are log-normal per category and quantities are
+skewed towards small stock levels with some items below their reorder point.
+"""
+import random
+
+CATEGORIES = [
+    "Electronics", "Office Supplies", "Furniture", "Kitchen", "Tools", "Cleaning",
+    "Stationery", "Networking", "Lighting", "Storage", "Safety", "Packaging",
+    "Plumbing", "Garden", "Automotive", "Sports", "Toys", "Health", "Beauty", "Books",
+    "Audio", "Cables", "Paint", "Hardware", "Textiles", "Pet Supplies", "Food Service",
+    "Medical", "Laboratory", "Electrical",
+]
+BRANDS = ["Acme", "Nordic", "Apex", "Vertex", "Summit", "Orion", "Zenith", "Atlas", "Pioneer", "Harbor",
+          "Keystone", "Evergreen", "Granite", "Bluebird", "Redwood", "Falcon"]
+ADJECTIVES = ["Compact", "Heavy-Duty", "Wireless", "Portable", "Premium", "Basic", "Ergonomic", "Stainless",
+              "Adjustable", "Rechargeable", "Waterproof", "Industrial", "Mini", "Large", "Smart", "Classic"]
+NOUNS = ["Stapler", "Monitor", "Chair", "Kettle", "Drill", "Mop", "Notebook", "Router", "Lamp", "Shelf",
+         "Gloves", "Tape", "Valve", "Hose", "Charger", "Ball", "Puzzle", "Bandage", "Brush", "Novel",
+         "Speaker", "Cable", "Roller", "Hinge", "Towel", "Leash", "Tray", "Thermometer", "Beaker", "Switch"]
+USER_ROLES = ("admin", "viewer")
+
+
+def _zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def generate_items(count, seed=42, start_id=1):
+    """Yield `count` item dicts with consecutive IDs starting at start_id."""
+    rng = random.Random(seed)
+    weights = _zipf_weights(len(CATEGORIES))
+    # Each category gets its own typical price level
+    price_levels = {category: rng.uniform(1.0, 6.0) for category in CATEGORIES}
+    categories = rng.choices(CATEGORIES, weights=weights, k=count)
+    for offset, category in enumerate(categories):
+        name = (f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} "
+                f"{rng.choice('ABCDEFGHJKLMNPRSTX')}{rng.randint(10, 9999)}")
+        item = {
+            "id": start_id + offset,
+            "name": name,
+            "category": category,
+            "quantity": min(int(rng.paretovariate(1.2) * 25) - 25, 100_000) if rng.random() < 0.97 else 0,
+            "price": round(rng.lognormvariate(price_levels[category], 0.8), 2),
+        }
+        if rng.random() < 0.3:
+            item["reorder_point"] = rng.randint(1, 50)
+        yield item
+
+
+def generate_users(count, password_hash, seed=42, password="password"):
+    """Return a users mapping {username: {"password", "role"}} for UserManager.
+
+    password_hash is the function used to hash the (shared) password, so
+    the data matches whatever scheme UserManager uses.
+    """
+    rng = random.Random(seed)
+    hashed = password_hash(password)
+    return {
+        f"user{index:06d}": {"password": hashed, "role": rng.choices(USER_ROLES, weights=(1, 9))[0]}
+        for index in range(count)
+    }
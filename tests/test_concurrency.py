@@ -0,0 +1,211 @@
+"""Several InventoryAPI instances (and processes) sharing one datastore."""
+import multiprocessing
+import pytest
+import sqlite_store
+from datastore import DataStore
+from inventory_api import ConflictError, InventoryAPI
+from sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "inventory.json")
+
+
+def open_api(path, **options):
+    return InventoryAPI(datastore=DataStore(path, compact_threshold=options.pop("compact_threshold", 1000)), **options)
+
+
+def stored_items(path):
+    return {item["id"]: item for item in DataStore(path).load_data()}
+
+
+def add_items(path, count):
+    api = open_api(path, batch_writes=True)
+    for index in range(count):
+        api.create_item(f"item {index}", "parts", 1, 1.0)
+    api.flush()
+    api.datastore.close()
+
+
+def test_batched_adds_in_two_instances_get_distinct_ids(path):
+    first, second = open_api(path, batch_writes=True), open_api(path, batch_writes=True)
+    a = first.create_item("bolt", "parts", 1, 1.0)
+    b = second.create_item("nut", "parts", 2, 1.0)
+    first.flush()
+    second.flush()
+
+    assert a["id"] != b["id"]
+    assert sorted(item["name"] for item in stored_items(path).values()) == ["bolt", "nut"]
+
+
+def test_processes_adding_at_once_never_reuse_an_id(path):
+    processes = [multiprocessing.Process(target=add_items, args=(path, 25)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert sorted(stored_items(path)) == list(range(1, 101))
+
+
+def test_stale_edit_of_other_fields_is_merged(path):
+    first = open_api(path)
+    item = first.create_item("bolt", "parts", 5, 1.0)
+    second = open_api(path)
+
+    first.update_item(item["id"], expected_version=1, price=2.0)
+    updated = second.update_item(item["id"], expected_version=1, name="hex bolt")
+
+    assert (updated["name"], updated["price"], updated["version"]) == ("hex bolt", 2.0, 3)
+    assert stored_items(path)[item["id"]]["price"] == 2.0
+
+
+def test_stale_edit_of_the_same_field_conflicts(path):
+    first = open_api(path)
+    item = first.create_item("bolt", "parts", 5, 1.0)
+    second = open_api(path)
+
+    first.update_item(item["id"], expected_version=1, quantity=7)
+    with pytest.raises(ConflictError):
+        second.update_item(item["id"], expected_version=1, quantity=9)
+    assert stored_items(path)[item["id"]]["quantity"] == 7
+
+
+def test_refresh_after_compaction_reads_only_new_changes(path):
+    writer = open_api(path, compact_threshold=5)
+    reader = open_api(path)
+    for index in range(3):
+        writer.create_item(f"item {index}", "parts", 1, 1.0)
+    assert reader.refresh() == 3
+
+    # Crosses the threshold: the log is sealed and folded into the snapshot
+    for index in range(3, 8):
+        writer.create_item(f"item {index}", "parts", 1, 1.0)
+    writer.datastore.wait_for_compaction()
+    writer.adjust_quantity(1, 4)
+
+    assert reader.refresh() == 6
+    assert len(reader.store) == 8
+    assert reader.get_item(1)["quantity"] == 5
+
+
+def test_reader_behind_several_compactions_reloads(path):
+    writer = open_api(path, compact_threshold=2)
+    reader = open_api(path)
+    for index in range(8):
+        writer.create_item(f"item {index}", "parts", 1, 1.0)
+        writer.datastore.wait_for_compaction()
+
+    assert reader.refresh() is None
+    assert sorted(item["id"] for item in reader.inventory) == list(range(1, 9))
+    assert reader.refresh() == 0
+
+
+def test_sqlite_poll_changes_returns_only_new_records(tmp_path):
+    db_path = str(tmp_path / "inventory.db")
+    writer = InventoryAPI(datastore=SQLiteStore(db_path))
+    reader = InventoryAPI(datastore=SQLiteStore(db_path))
+    writer.create_item("bolt", "parts", 5, 1.0)
+    writer.create_item("nut", "parts", 5, 1.0)
+    assert reader.refresh() == 2
+
+    writer.adjust_quantity(1, -2)
+    writer.remove_item(2)
+    assert reader.datastore.poll_changes() == [
+        {"op": "update", "item": dict(writer.get_item(1)), "seq": 3},
+        {"op": "delete", "id": 2, "seq": 4},
+    ]
+    assert reader.refresh() == 0
+
+
+def test_sqlite_reader_behind_pruned_changes_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "CHANGES_KEPT", 2)
+    db_path = str(tmp_path / "inventory.db")
+    writer = InventoryAPI(datastore=SQLiteStore(db_path))
+    reader = InventoryAPI(datastore=SQLiteStore(db_path))
+    writer.create_item("bolt", "parts", 5, 1.0)
+    for _ in range(4):
+        writer.adjust_quantity(1, 1)
+
+    assert reader.refresh() is None
+    assert reader.get_item(1)["quantity"] == 9
+
+
+def test_write_after_another_instance_replaced_the_snapshot(path):
+    first = open_api(path)
+    first.create_item("bolt", "parts", 1, 1.0)
+    second = open_api(path)
+    first.datastore.save_data(list(stored_items(path).values()))
+
+    second.datastore.append_changes([("add", {"id": 2, "name": "nut", "category": "parts", "quantity": 1, "price": 1.0, "version": 1})])
+
+    assert second.datastore.poll_changes() is None
+    assert sorted(stored_items(path)) == [1, 2]
+
+
+def test_batched_stock_changes_keep_those_persisted_elsewhere(path):
+    first = open_api(path)
+    item = first.create_item("bolt", "parts", 10, 1.0)
+    batched = open_api(path, batch_writes=True)
+    other = open_api(path)
+
+    batched.adjust_quantity(item["id"], 5)
+    other.adjust_quantity(item["id"], 3)
+    batched.adjust_quantity(item["id"], 1)
+    batched.flush()
+
+    assert batched.get_item(item["id"])["quantity"] == 19
+    assert stored_items(path)[item["id"]]["quantity"] == 19
+
+
+def test_batched_edit_keeps_other_fields_changed_elsewhere(path):
+    first = open_api(path)
+    item = first.create_item("bolt", "parts", 10, 1.0)
+    batched = open_api(path, batch_writes=True)
+
+    batched.update_item(item["id"], name="hex bolt")
+    first.update_item(item["id"], price=2.0)
+    first.reserve(item["id"], 4)
+    batched.flush()
+
+    stored = stored_items(path)[item["id"]]
+    assert (stored["name"], stored["price"], stored["reserved"], stored["quantity"]) == ("hex bolt", 2.0, 4, 10)
+
+
+def test_batched_changes_to_an_item_deleted_elsewhere_are_dropped(path):
+    first = open_api(path)
+    item = first.create_item("bolt", "parts", 10, 1.0)
+    batched = open_api(path, batch_writes=True)
+
+    batched.adjust_quantity(item["id"], 5)
+    first.remove_item(item["id"])
+
+    assert batched.flush() == 0
+    assert item["id"] not in stored_items(path)
+
+
+def test_cli_edit_and_delete_of_an_item_deleted_meanwhile(path, monkeypatch):
+    from inventory_manager import InventoryManager
+    manager = InventoryManager(datastore=DataStore(path), history=None)
+    item = manager.create_item("bolt", "parts", 5, 1.0)
+    other = open_api(path)
+
+    def edit_answers():
+        yield str(item["id"])
+        other.remove_item(item["id"])  # while the new values are being typed
+        while True:
+            yield ""
+
+    answers = edit_answers()
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    manager.edit_item()
+
+    nut = manager.create_item("nut", "parts", 1, 1.0)
+    other.refresh()
+    other.remove_item(nut["id"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": str(nut["id"]))
+    manager.delete_item()
+
+    assert item["id"] not in manager.store and nut["id"] not in manager.store
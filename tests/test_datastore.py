@@ -0,0 +1,67 @@
+"""DataStore change log replay and recovery from interrupted writes."""
+import os
+import pytest
+from datastore import DataStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "inventory.json")
+
+
+def item(item_id, quantity=1):
+    return {"id": item_id, "name": f"item {item_id}", "category": "parts", "quantity": quantity, "price": 1.0}
+
+
+def stored(path):
+    return {entry["id"]: entry["quantity"] for entry in DataStore(path).load_data()}
+
+
+def test_log_is_replayed_over_the_snapshot(path):
+    store = DataStore(path)
+    store.save_data([item(1), item(2)])
+    store.append_changes([("add", item(3)), ("update", item(1, quantity=5)), ("delete", {"id": 2})])
+
+    assert stored(path) == {1: 5, 3: 1}
+    assert DataStore(path).load_data() == list(DataStore(path).iter_items())
+
+
+def test_append_after_a_torn_record_is_kept(path):
+    DataStore(path).append_changes([("add", item(1))])
+    with open(DataStore(path).log_path, "a") as file:
+        file.write('{"op":"add","item":{"id":2,"na')
+
+    DataStore(path).append_changes([("add", item(3))])
+
+    assert stored(path) == {1: 1, 3: 1}
+    DataStore(path).append_changes([("update", item(3, quantity=4))])
+    assert stored(path) == {1: 1, 3: 4}
+
+
+def test_interrupted_compaction_is_finished_later(path):
+    store = DataStore(path)
+    store.save_data([item(1)])
+    store.append_changes([("update", item(1, quantity=2)), ("add", item(2))])
+    # A crash after the log was sealed but before it was folded in
+    os.replace(store.log_path, store.sealed_log_path)
+
+    reopened = DataStore(path)
+    assert {entry["id"] for entry in reopened.load_data()} == {1, 2}
+    reopened.append_changes([("add", item(3))])
+    reopened.compact(wait=True)
+
+    assert not os.path.exists(reopened.sealed_log_path)
+    assert stored(path) == {1: 2, 2: 1, 3: 1}
+
+
+def test_records_already_in_the_snapshot_replay_harmlessly(path):
+    store = DataStore(path)
+    store.append_changes([("add", item(1)), ("update", item(1, quantity=3)), ("add", item(2))])
+    with open(store.log_path, "rb") as file:
+        log = file.read()
+    store.compact(wait=True)
+    # A crash between installing the snapshot and retiring the sealed log
+    with open(store.sealed_log_path, "wb") as file:
+        file.write(log)
+
+    assert stored(path) == {1: 3, 2: 1}
@@ -0,0 +1,37 @@
+"""InventoryStore indexes."""
+from bisect import bisect_left, insort
+import random
+from inventory_store import InventoryStore, SortedEntries
+
+
+def test_sorted_entries_match_a_sorted_list(monkeypatch):
+    monkeypatch.setattr(SortedEntries, "LOAD", 4)
+    rng = random.Random(7)
+    expected = sorted((rng.randint(0, 20), index) for index in range(30))
+    entries = SortedEntries(expected)
+    for _ in range(2000):
+        value = (rng.randint(0, 20), rng.randint(0, 60))
+        if rng.random() < 0.5:
+            entries.add(value)
+            insort(expected, value)
+        else:
+            entries.remove(value)
+            if value in expected:
+                expected.remove(value)
+        assert entries.bisect_left(value) == bisect_left(expected, value)
+    assert list(entries) == expected
+    assert entries[5:40] == expected[5:40] and entries[-3] == expected[-3]
+    assert bisect_left(entries, (10,)) == bisect_left(expected, (10,))
+
+
+def test_update_moves_only_changed_keys():
+    store = InventoryStore([
+        {"id": item_id, "name": f"item {item_id}", "category": "parts", "quantity": item_id, "price": 1.0}
+        for item_id in range(1, 6)
+    ])
+
+    store.update(2, {"quantity": 10})
+
+    assert [item["id"] for item in store.find_quantity_below(100)[0]] == [1, 3, 4, 5, 2]
+    assert [item["id"] for item in store.find_price_between(1.0, 1.0)[0]] == [1, 2, 3, 4, 5]
+    assert store.indexes["value"].below(100, 2) == ([1, 3], 5)
@@ -0,0 +1,135 @@
+"""Publishing inventory deltas and following them from replicas."""
+import json
+import threading
+import pytest
+from datastore import DataStore
+from inventory_api import InventoryAPI
+from replication import DirectoryTransport, PublishingStore, ReplicaStore
+
+
+@pytest.fixture
+def primary(tmp_path):
+    store = PublishingStore(DataStore(str(tmp_path / "inventory.json")), DirectoryTransport(str(tmp_path / "replication")))
+    yield store
+    store.close()
+
+
+def item(item_id, quantity=1):
+    return {"id": item_id, "name": f"item {item_id}", "category": "parts", "quantity": quantity, "price": 1.0}
+
+
+def replica_items(replica):
+    return {entry["id"]: entry["quantity"] for entry in replica.load_data()}
+
+
+def corrupt_delta(transport, seq):
+    path = transport._delta_path(seq)
+    with open(path, "r") as file:
+        delta = json.load(file)
+    delta["records"][0]["item"]["quantity"] = 999
+    with open(path, "w") as file:
+        json.dump(delta, file)
+
+
+def test_replica_resumes_from_its_cache(primary, tmp_path):
+    primary.load_data()
+    primary.append_changes([("add", item(1))])
+    cache_path = str(tmp_path / "replica" / "inventory.json")
+    replica = ReplicaStore(DirectoryTransport(primary.transport.directory), cache_path)
+    assert replica_items(replica) == {1: 1}
+    replica.close()
+
+    primary.append_changes([("update", item(1, quantity=4)), ("add", item(2))])
+    restarted = ReplicaStore(DirectoryTransport(primary.transport.directory), cache_path)
+    assert replica_items(restarted) == {1: 4, 2: 1}
+    assert restarted.version == primary.transport.head()["seq"]
+
+
+def test_replica_behind_pruned_deltas_resyncs(primary):
+    primary.transport.snapshot_every = 3
+    primary.transport.retain = 0
+    primary.load_data()
+    replica = ReplicaStore(DirectoryTransport(primary.transport.directory))
+    replica.load_data()
+
+    for item_id in range(1, 5):
+        primary.append_changes([("add", item(item_id))])
+    primary.transport.wait_for_compaction()
+
+    assert replica.poll_changes() is None
+    assert replica_items(replica) == {1: 1, 2: 1, 3: 1, 4: 1}
+
+
+def test_corrupt_delta_is_skipped_until_a_snapshot_covers_it(primary):
+    primary.load_data()
+    replica = ReplicaStore(DirectoryTransport(primary.transport.directory))
+    replica.load_data()
+    primary.append_changes([("add", item(1))])
+    primary.append_changes([("add", item(2))])
+    corrupt_delta(primary.transport, 3)
+
+    assert [record["item"]["id"] for record in replica.poll_changes()] == [1]
+    assert replica.poll_changes() == []
+
+    primary.transport.compact(wait=True)
+    assert primary.transport.head()["snapshot_seq"] == 1
+
+    primary.save_data([item(1), item(2)])
+    assert replica.poll_changes() is None
+    assert replica_items(replica) == {1: 1, 2: 1}
+
+
+def test_compact_store_load_publishes_a_snapshot(tmp_path):
+    path = str(tmp_path / "inventory.json")
+    DataStore(path, snapshot_format="binary").save_data([item(1), item(2)])
+    primary = PublishingStore(DataStore(path, snapshot_format="binary"), DirectoryTransport(str(tmp_path / "replication")))
+
+    api = InventoryAPI(datastore=primary, compact=True)
+
+    assert len(api.inventory) == 2
+    assert replica_items(ReplicaStore(DirectoryTransport(primary.transport.directory))) == {1: 1, 2: 1}
+
+
+def test_save_during_a_compaction_does_not_deadlock(primary, monkeypatch):
+    primary.load_data()
+    primary.append_changes([("add", item(1))])
+    backend = primary.backend
+    started, proceed = threading.Event(), threading.Event()
+    prepare_snapshot = backend._prepare_snapshot
+
+    def slow_prepare_snapshot(data):
+        if threading.current_thread().name == "datastore-compaction":
+            started.set()
+            proceed.wait(5)
+        return prepare_snapshot(data)
+
+    monkeypatch.setattr(backend, "_prepare_snapshot", slow_prepare_snapshot)
+    backend.compact()
+    assert started.wait(5)
+    saver = threading.Thread(target=primary.save_data, args=([item(2)],), daemon=True)
+    saver.start()
+    saver.join(0.2)  # Let it get as far as it can while the compaction is running
+    proceed.set()
+    saver.join(10)
+
+    assert not saver.is_alive()
+    assert [entry["id"] for entry in DataStore(backend.file_path).load_data()] == [2]
+
+    # The backend alone, saved by a thread that already holds its lock
+    backend.append_changes([("add", item(3))])
+    started.clear()
+    proceed.clear()
+    backend.compact()
+    assert started.wait(5)
+
+    def save_holding_the_lock():
+        with backend.lock():
+            backend.save_data([item(4)])
+
+    saver = threading.Thread(target=save_holding_the_lock, daemon=True)
+    saver.start()
+    saver.join(10)
+    assert not saver.is_alive()
+    proceed.set()
+    backend.wait_for_compaction()
+    assert [entry["id"] for entry in DataStore(backend.file_path).load_data()] == [4]
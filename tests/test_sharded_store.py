@@ -0,0 +1,32 @@
+"""Sharded storage loaded by worker processes."""
+import pytest
+from datastore import DataStore
+from sharded_store import ShardedStore
+from sqlite_store import SQLiteStore
+
+
+def item(item_id, warehouse, quantity=1):
+    return {"id": item_id, "name": f"item {item_id}", "category": "parts", "quantity": quantity, "price": 1.0, "warehouse": warehouse}
+
+
+@pytest.mark.parametrize("backend, extension, open_shard", [("json", "json", DataStore), ("sqlite", "db", SQLiteStore)])
+def test_worker_loaded_shards_poll_only_new_changes(tmp_path, backend, extension, open_shard):
+    paths = {name: str(tmp_path / f"{name}.{extension}") for name in ("north", "south")}
+    for item_id, name in enumerate(paths, start=1):
+        shard = open_shard(paths[name])
+        shard.save_data([item(item_id, name)])
+        shard.append_changes([("update", item(item_id, name, quantity=5))])
+        shard.close()
+
+    store = ShardedStore(paths, backend=backend, max_workers=2)
+    assert sorted((entry["id"], entry["quantity"]) for entry in store.load_data()) == [(1, 5), (2, 5)]
+    assert store.poll_changes() == []
+
+    other = open_shard(paths["south"])
+    other.append_changes([("add", item(3, "south"))])
+    other.close()
+    assert [record["item"]["id"] for record in store.poll_changes()] == [3]
+
+    with store.lock():
+        assert len(store.load_data()) == 3
+    store.close()
@@ -0,0 +1,34 @@
+"""Binary snapshots and the compact column store built from them."""
+from columnar import ColumnarItems
+from snapshot import BinarySnapshot, write_snapshot
+
+ITEMS = [
+    {"id": 1, "name": "bolt", "category": "parts", "quantity": 5, "price": 1.5, "version": 3, "reserved": 2},
+    {"id": 2, "name": "nut", "category": "parts", "quantity": 0, "price": 0.25, "version": 1},
+    {"id": 3, "name": "drill", "category": "tools", "quantity": 1, "price": 80.0, "warehouse": "north"},
+]
+
+
+def test_snapshot_round_trip_keeps_counters_and_extras(tmp_path):
+    path = str(tmp_path / "inventory.snap")
+    write_snapshot(path, ITEMS)
+
+    with BinarySnapshot(path) as snapshot:
+        assert list(snapshot) == ITEMS
+        assert snapshot.extras == {2: {"warehouse": "north"}}
+        table = ColumnarItems.from_snapshot(snapshot)
+
+    assert [dict(item) for item in table.values()] == ITEMS
+    assert table._extras == {2: {"warehouse": "north"}}
+
+
+def test_counters_are_columns_not_per_row_dicts():
+    table = ColumnarItems()
+    for item in ITEMS:
+        table[item["id"]] = item
+
+    table[2]["reserved"] = 1
+    del table[1]["reserved"]
+
+    assert table[2]["reserved"] == 1 and "reserved" not in table[1]
+    assert list(table._extras) == [2]
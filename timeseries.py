@@ -0,0 +1,261 @@
+"""Time series of inventory totals with hourly, daily and monthly rollups.
+
+Each sample holds the total value, units, item count and per-category
+value at one moment. Samples are appended to `raw.jsonl` and folded into an
+open hourly bucket; when an hour ends its bucket is written to `hour.jsonl`
+and folded into the open day, days roll into months the same way. A bucket
+keeps open/close/low/high/mean of the total value and the closing units,
+item count and category values, so a trend over any window reads one
+pre-aggregated bucket per period.
+
+Older data is downsampled by retention: raw samples are kept for two days,
+hourly buckets for about three months and daily buckets for five years;
+monthly buckets are kept forever. After a restart, open buckets are rebuilt
+from the finer level below them.
+
+Several processes can share one history directory: writes hold a file lock
+(`history.lock`), and a process whose view is stale because another one
+appended a sample reloads the files before recording or reading a trend.
+"""
+from bisect import bisect_left
+import calendar
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import threading
+import time
+from filelock import FileLock
+
+LEVELS = ("hour", "day", "month")
+RETENTION = {"raw": 2 * 86400, "hour": 92 * 86400, "day": 5 * 366 * 86400, "month": None}
+
+
+def bucket_start(level, timestamp):
+    """Start (UTC epoch seconds) of the bucket at `level` containing timestamp."""
+    timestamp = int(timestamp)
+    if level == "hour":
+        return timestamp - timestamp % 3600
+    if level == "day":
+        return timestamp - timestamp % 86400
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return calendar.timegm((moment.year, moment.month, 1, 0, 0, 0))
+
+
+def _sample_bucket(sample):
+    value = sample["value"]
+    return {
+        "start": sample["t"], "samples": 1, "open": value, "close": value, "low": value, "high": value,
+        "total": value, "units": sample["units"], "items": sample["items"], "categories": sample["categories"],
+    }
+
+
+def _sample(aggregates, now):
+    return {
+        "t": int(now),
+        "value": round(aggregates.total_value, 2),
+        "units": aggregates.total_units,
+        "items": aggregates.item_count,
+        "categories": {category: round(value, 2) for category, value in aggregates.category_value.items()},
+    }
+
+
+def _merge(bucket, later):
+    """Fold a later bucket into `bucket` in place."""
+    bucket["samples"] += later["samples"]
+    bucket["close"] = later["close"]
+    bucket["low"] = min(bucket["low"], later["low"])
+    bucket["high"] = max(bucket["high"], later["high"])
+    bucket["total"] += later["total"]
+    bucket["units"] = later["units"]
+    bucket["items"] = later["items"]
+    bucket["categories"] = later["categories"]
+
+
+class ValueHistory:
+    """Append-only store of inventory totals with rollups, kept under `directory`.
+
+    `observe` records a sample at most once per `interval` seconds, so it
+    can be called after every mutation; `record` always records one.
+    """
+
+    def __init__(self, directory, interval=60):
+        self.directory = directory
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(directory, "history.lock"))
+        # (inode, size, mtime) of raw.jsonl as of the last load or write by this process
+        self._raw_stat = None
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, self._file_lock:
+            self._load()
+
+    def _path(self, level):
+        return os.path.join(self.directory, f"{level}.jsonl")
+
+    def _read(self, level):
+        entries = []
+        path = self._path(level)
+        if not os.path.exists(path):
+            return entries
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning("Skipping corrupt history record in %s", path)
+        return entries
+
+    def _append(self, level, entry):
+        with open(self._path(level), "a") as file:
+            file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def _stat_raw(self):
+        try:
+            stat = os.stat(self._path("raw"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _refresh(self):
+        """Reload if another process wrote samples since we last looked (both locks held).
+
+        Every sample goes to raw.jsonl, so a change there covers the rollups too.
+        """
+        if self._stat_raw() != self._raw_stat:
+            self._load()
+
+    def _load(self):
+        self._closed = {level: [] for level in LEVELS}
+        self._starts = {level: [] for level in LEVELS}
+        self._open = {level: None for level in LEVELS}
+        self._last_sample = None
+        for level in LEVELS:
+            self._closed[level] = self._read(level)
+            self._starts[level] = [bucket["start"] for bucket in self._closed[level]]
+
+        # Rebuild the open buckets bottom-up from whatever has not been rolled up yet
+        raw = self._read("raw")
+        if raw:
+            self._last_sample = raw[-1]["t"]
+        lower = [_sample_bucket(sample) for sample in raw]
+        for index, level in enumerate(LEVELS):
+            closed_starts = self._starts[level]
+            last_closed = closed_starts[-1] if closed_starts else None
+            for bucket in lower:
+                if last_closed is None or bucket_start(level, bucket["start"]) > last_closed:
+                    self._feed(index, bucket, cascade=False)
+            lower = self._closed[level]
+        self._raw_stat = self._stat_raw()
+
+    def observe(self, aggregates, now=None):
+        """Record a sample unless one was taken less than `interval` seconds ago."""
+        now = time.time() if now is None else now
+        # Other processes only ever make the last sample newer, so this skips without locking
+        if self._last_sample is not None and now - self._last_sample < self.interval:
+            return False
+        with self._lock, self._file_lock:
+            self._refresh()
+            if self._last_sample is not None and now - self._last_sample < self.interval:
+                return False
+            self._record(_sample(aggregates, now))
+        return True
+
+    def record(self, aggregates, now=None):
+        """Append a sample of the current aggregates (see aggregates.py)."""
+        with self._lock, self._file_lock:
+            self._refresh()
+            self._record(_sample(aggregates, time.time() if now is None else now))
+
+    def _record(self, sample):
+        self._append("raw", sample)
+        self._last_sample = sample["t"]
+        self._feed(0, _sample_bucket(sample))
+        self._raw_stat = self._stat_raw()
+
+    def _feed(self, index, bucket, cascade=True):
+        level = LEVELS[index]
+        start = bucket_start(level, bucket["start"])
+        current = self._open[level]
+        if current is not None and start > current["start"]:
+            self._close(index, current, cascade)
+            current = None
+        if current is None:
+            self._open[level] = dict(bucket, start=start)
+        else:
+            # A sample from an earlier bucket (clock set back) joins the open one
+            _merge(current, bucket)
+
+    def _close(self, index, bucket, cascade):
+        level = LEVELS[index]
+        self._closed[level].append(bucket)
+        self._starts[level].append(bucket["start"])
+        self._append(level, bucket)
+        if cascade and index + 1 < len(LEVELS):
+            self._feed(index + 1, bucket)
+        if level == "day":
+            self._prune(bucket["start"] + 86400)
+
+    def _prune(self, now):
+        """Drop samples and buckets older than their level's retention."""
+        for level, retention in RETENTION.items():
+            if retention is None:
+                continue
+            cutoff = now - retention
+            if level == "raw":
+                entries = self._read("raw")
+                kept = [sample for sample in entries if sample["t"] >= cutoff]
+            else:
+                entries = self._closed[level]
+                position = bisect_left(self._starts[level], cutoff)
+                kept = entries[position:]
+                self._closed[level] = kept
+                self._starts[level] = self._starts[level][position:]
+            if len(kept) == len(entries):
+                continue
+            tmp_path = f"{self._path(level)}.tmp"
+            with open(tmp_path, "w") as file:
+                file.writelines(json.dumps(entry, separators=(",", ":")) + "\n" for entry in kept)
+            os.replace(tmp_path, self._path(level))
+
+    def _current(self, level):
+        """The open bucket at `level`, including the still-open finer buckets."""
+        current = dict(self._open[level]) if self._open[level] else None
+        for finer in reversed(LEVELS[:LEVELS.index(level)]):
+            bucket = self._open[finer]
+            if bucket is None:
+                continue
+            start = bucket_start(level, bucket["start"])
+            if current is None or start > current["start"]:
+                current = dict(bucket, start=start)
+            else:
+                _merge(current, bucket)
+        return current
+
+    def trend(self, level, since=None, latest=None, now=None):
+        """Buckets at `level` starting at or after `since`, oldest first.
+
+        The last bucket is the current, still-open period. Each bucket has
+        start, samples, open, close, low, high, mean, units, items and
+        categories. `latest` (aggregates) is folded in as a final sample
+        without being recorded, so the last close is up to date even when
+        recent changes fell within the sampling interval.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            position = bisect_left(self._starts[level], bucket_start(level, since)) if since is not None else 0
+            buckets = [dict(bucket) for bucket in self._closed[level][position:]]
+            current = self._current(level)
+        if latest is not None:
+            sample = _sample_bucket(_sample(latest, time.time() if now is None else now))
+            start = bucket_start(level, sample["start"])
+            if current is None or start > current["start"]:
+                current = dict(sample, start=start)
+            else:
+                _merge(current, sample)
+        if current is not None and (since is None or current["start"] >= bucket_start(level, since)):
+            buckets.append(current)
+        for bucket in buckets:
+            bucket["mean"] = bucket["total"] / bucket["samples"]
+        return buckets
@@ -1,17 +1,28 @@
-import hashlib
 from rich.prompt import Prompt
 from rich.console import Console
-from datastore import DataStore
+from storage import create_datastore
+from passwords import PasswordHasher, needs_rehash
 import logging
+import threading
 
 class UserManager:
-    USERS_FILE = "data/users.json"  # Using the DataStore for user credentials
+    """Accounts keyed by username, with salted KDF password hashes (see passwords.py).
 
-    def __init__(self):
+    The users mapping is held in memory as the lookup index. Sign-ups and
+    password upgrades append one record to the store instead of rewriting
+    it, and a username that is not known yet is looked up again after
+    picking up the accounts other processes added. Password hashing runs
+    on `hasher`, a bounded worker pool, so `authenticate` can be called
+    from many threads at once.
+    """
+
+    def __init__(self, data_store=None, hasher=None):
         self.console = Console()
-        self.data_store = DataStore(file_path=self.USERS_FILE)
-        self.users = self.load_users()
+        self.data_store = data_store or create_datastore("users")  # Configured backend for user credentials
+        self.hasher = hasher or PasswordHasher()
         self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.users = self.load_users()
 
     def load_users(self):
         """Load user data using the DataStore."""
@@ -24,20 +35,87 @@ class UserManager:
             self.data_store.save_data(self.users)
             self.logger.info("User data saved successfully.")
         except Exception as e:
-            self.logger.error(f"Error saving user data: {e}")
+            self.logger.error("Error saving user data: %s", e)
+
+    def _save_user(self, username):
+        """Persist one account as a single change record."""
+        self.data_store.append_changes([("update", {"username": username, **self.users[username]})])
+
+    def _sync(self):
+        """Apply accounts other processes added or changed (lock held)."""
+        records = self.data_store.poll_changes()
+        if records is None:
+            self.users = self.load_users()
+            return
+        for record in records:
+            if record["op"] == "delete":
+                self.users.pop(record["username"], None)
+            else:
+                user = dict(record["item"])
+                self.users[user.pop("username")] = user
+
+    def get_user(self, username):
+        with self._lock:
+            if username not in self.users:
+                self._sync()
+            return self.users.get(username)
 
     def hash_password(self, password: str) -> str:
-        """Hash a password using SHA256."""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash a password with the configured KDF and a fresh salt."""
+        return self.hasher.hash(password).result()
+
+    def authenticate(self, username, password):
+        """Return the user's role if the password is right, else None.
+
+        A hash made with an older scheme or cost is replaced in the
+        background once the password is known to be right.
+        """
+        user = self.get_user(username)
+        if user is None or not self.hasher.verify(password, user["password"]).result():
+            return None
+        if needs_rehash(user["password"]):
+            upgrade = self.hasher.hash(password)
+            upgrade.add_done_callback(lambda future: self._upgrade_hash(username, user["password"], future))
+        return user["role"]
+
+    def _upgrade_hash(self, username, old_hash, future):
+        try:
+            new_hash = future.result()
+            with self._lock, self.data_store.lock():
+                self._sync()
+                user = self.users.get(username)
+                if user is None or user["password"] != old_hash:
+                    return  # Changed meanwhile
+                user["password"] = new_hash
+                self._save_user(username)
+            self.logger.info("Upgraded password hash of user: %s", username)
+        except Exception as e:
+            self.logger.error("Error upgrading password hash of user %s: %s", username, e)
+
+    def create_user(self, username, password, role):
+        """Add an account; returns False if the username is taken."""
+        password_hash = self.hash_password(password)
+        with self._lock, self.data_store.lock():
+            self._sync()
+            if username in self.users:
+                return False
+            self.users[username] = {"password": password_hash, "role": role}
+            self._save_user(username)
+        return True
+
+    def close(self):
+        """Finish pending hash upgrades and close the store."""
+        self.hasher.shutdown()
+        self.data_store.close()
 
     def sign_up(self):
         """Sign up a new user."""
         self.console.print("\n[bold cyan]Sign Up[/bold cyan]")
         try:
             username = Prompt.ask("Enter a new username")
-            if username in self.users:
+            if self.get_user(username) is not None:
                 self.console.print("[bold red]Username already exists! Try logging in.[/bold red]")
-                self.logger.warning(f"Username already exists: {username}")
+                self.logger.warning("Username already exists: %s", username)
                 return False
 
             password = Prompt.ask("Enter a new password", password=True)
@@ -47,34 +125,36 @@ class UserManager:
                 return False
 
             role = Prompt.ask("Assign a role (admin/viewer)", choices=["admin", "viewer"])
-            self.users[username] = {"password": self.hash_password(password), "role": role}
-            self.save_users()
+            if not self.create_user(username, password, role):
+                self.console.print("[bold red]Username already exists! Try logging in.[/bold red]")
+                self.logger.warning("Username already exists: %s", username)
+                return False
             self.console.print("[bold green]Account created successfully![/bold green]")
-            self.logger.info(f"New user signed up: {username}")
+            self.logger.info("New user signed up: %s", username)
             return True
         except Exception as e:
-            self.logger.error(f"An error occurred during sign-up: {e}")
+            self.logger.error("An error occurred during sign-up: %s", e)
             return False
 
     def login(self):
         """Login an existing user."""
         self.console.print("\n[bold cyan]Login[/bold cyan]")
         username = Prompt.ask("Enter your username")
-        if username not in self.users:
+        if self.get_user(username) is None:
             self.console.print("[bold red]Username not found![/bold red]")
             return None, None
 
         try:
             password = Prompt.ask("Enter your password", password=True)
-            hashed_password = self.hash_password(password)
-            if self.users[username]["password"] == hashed_password:
+            role = self.authenticate(username, password)
+            if role is not None:
                 self.console.print("[bold green]Login successful![/bold green]")
-                self.logger.info(f"User logged in: {username}")
-                return username, self.users[username]["role"]
+                self.logger.info("User logged in: %s", username)
+                return username, role
 
             self.console.print("[bold red]Incorrect password![/bold red]")
-            self.logger.warning(f"Login attempt failed for user: {username}")
+            self.logger.warning("Login attempt failed for user: %s", username)
             return None, None
         except Exception as e:
-            self.logger.error(f"An error occurred during login: {e}")
+            self.logger.error("An error occurred during login: %s", e)
             return None, None